@@ -1,15 +1,22 @@
+import asyncio
 import logging
 import os
+import re
 import secrets
 import socket
 import subprocess
+import threading
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta, timezone
 from urllib.parse import urlparse
 
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 from flask import Flask, jsonify, send_from_directory, request, render_template
 from flask_cors import CORS
 from functools import wraps
+from werkzeug.exceptions import NotFound
 
 from config_manager import ConfigManager
 from ota_manager import OTAManager
@@ -27,6 +34,28 @@ app = Flask(
 
 CORS(app, resources={r"/api/*": {"origins": "self"}})
 
+# SSID: 1-32 chars, printable ASCII, no quotes or backslashes
+SSID_RE = re.compile(r"^[a-zA-Z0-9 _\-\.]{1,32}$")
+# WPA passphrase: printable ASCII only
+WPA_PASSWORD_RE = re.compile(r"^[\x20-\x7E]+$")
+
+AP_MANAGER_SCRIPT = os.path.join(
+    os.path.dirname(os.path.abspath(__file__)), "..", "scripts", "wifi-ap-manager.sh"
+)
+
+# Shared session so repeated PostHog validations reuse the TLS connection.
+# Retry a failed connect once but never a read timeout, so a validation is
+# bounded by at most two connect timeouts plus one read timeout.
+_posthog_session = requests.Session()
+_posthog_session.mount(
+    "https://",
+    HTTPAdapter(
+        pool_connections=4,
+        pool_maxsize=10,
+        max_retries=Retry(total=1, connect=1, read=0),
+    ),
+)
+
 config_manager = ConfigManager()
 ota_manager = OTAManager(config_manager)
 theme_manager = ThemeManager(config_manager)
@@ -34,7 +63,7 @@ theme_manager = ThemeManager(config_manager)
 
 def _get_or_create_admin_token() -> str:
     """Get existing admin token or generate one on first boot"""
-    config = config_manager.get_config()
+    config = config_manager.get_config_view()
     token = config.get("advanced", {}).get("admin_token")
     if not token:
         token = secrets.token_urlsafe(32)
@@ -68,7 +97,7 @@ def get_admin_token():
 # Load PostHog configuration from config file or environment
 def get_posthog_config():
     """Get PostHog configuration from config file or environment variables"""
-    config = config_manager.get_config()
+    config = config_manager.get_config_view()
 
     # Get from saved config
     api_key = config.get("posthog", {}).get("api_key")
@@ -103,6 +132,20 @@ DEMO_METRICS = {
     "demo_mode": True,
 }
 
+# Single HogQL query returning every 24h counter, so PostHog aggregates
+# server-side instead of us filtering a capped page of raw events.
+HOGQL_METRICS_QUERY = """
+SELECT
+    count(),
+    count(DISTINCT distinct_id),
+    countIf(event = '$pageview'),
+    countIf(event NOT IN ('$pageview', '$pageleave')),
+    count(DISTINCT nullIf(properties.$session_id, '')),
+    countIf(timestamp > now() - INTERVAL 1 HOUR)
+FROM events
+WHERE timestamp > now() - INTERVAL 1 DAY
+"""
+
 LAYOUT_POSITION_MAPS = {
     "classic": {
         "positions": {"top": "top", "left": "left", "right": "right"},
@@ -182,6 +225,62 @@ def get_available_metrics():
     )
 
 
+def spawn_background(cmd):
+    """Start a command without waiting for it to finish"""
+    return subprocess.Popen(
+        cmd,
+        stdin=subprocess.DEVNULL,
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL,
+        start_new_session=True,
+    )
+
+
+# The AP manager's start/stop runs take a while (service restarts, maybe an
+# apt-get), so never let two of them overlap
+_ap_manager_proc = None
+_ap_manager_lock = threading.Lock()
+
+
+def run_ap_manager(action):
+    """Start the AP manager in the background unless a previous run is still going"""
+    global _ap_manager_proc
+    with _ap_manager_lock:
+        if _ap_manager_proc is not None and _ap_manager_proc.poll() is None:
+            return False
+        _ap_manager_proc = spawn_background(["sudo", AP_MANAGER_SCRIPT, action])
+        return True
+
+
+async def _probe(cmd, timeout):
+    """Run a command, returning (returncode, stdout) or None on failure/timeout"""
+    try:
+        proc = await asyncio.create_subprocess_exec(
+            *cmd,
+            stdin=asyncio.subprocess.DEVNULL,
+            stdout=asyncio.subprocess.PIPE,
+            stderr=asyncio.subprocess.DEVNULL,
+        )
+    except OSError:
+        return None
+    try:
+        stdout, _ = await asyncio.wait_for(proc.communicate(), timeout)
+    except asyncio.TimeoutError:
+        proc.kill()
+        await proc.wait()
+        return None
+    return proc.returncode, stdout.decode(errors="replace")
+
+
+def run_probes(*probes):
+    """Run (cmd, timeout) probes concurrently and return their results in order"""
+
+    async def gather():
+        return await asyncio.gather(*(_probe(cmd, timeout) for cmd, timeout in probes))
+
+    return asyncio.run(gather())
+
+
 def check_and_start_wap_if_needed():
     try:
         result = subprocess.run(
@@ -194,19 +293,77 @@ def check_and_start_wap_if_needed():
         if not has_network:
             # Check if WAP is already running
             if not os.path.exists("/tmp/wifi_ap_mode"):
-                # Start WAP immediately
-                app_dir = os.path.dirname(os.path.abspath(__file__))
-                script_path = os.path.join(app_dir, "..", "scripts", "wifi-ap-manager.sh")
-                subprocess.run(
-                    ["sudo", script_path, "start"],
-                    timeout=30
-                )
-                return True  # WAP started
+                # Start WAP without holding up the caller; False while an
+                # earlier start is still running
+                return run_ap_manager("start")
         return False  # No WAP needed
     except Exception:
         return False
 
 
+def fetch_posthog_aggregates(host, project_id, headers):
+    """Count the 24h metrics server-side with one HogQL query.
+
+    Returns None when the query endpoint is unavailable so callers can fall
+    back to computing the metrics from the raw events list.
+    """
+    query_url = f"{host}/api/projects/{project_id}/query/"
+    payload = {"query": {"kind": "HogQLQuery", "query": HOGQL_METRICS_QUERY}}
+
+    response = requests.post(query_url, headers=headers, json=payload, timeout=5)
+    if response.status_code != 200:
+        return None
+
+    rows = response.json().get("results") or []
+    if not rows:
+        return None
+
+    events_24h, unique_users, page_views, custom_events, sessions, events_1h = rows[0]
+    return {
+        "events_24h": events_24h,
+        "unique_users_24h": unique_users,
+        "page_views_24h": page_views,
+        "custom_events_24h": custom_events,
+        "sessions_24h": sessions,
+        "events_1h": events_1h,
+    }
+
+
+def compute_event_metrics(events):
+    """Compute the 24h metrics client-side from a list of raw events"""
+    unique_users = len(set(e.get("distinct_id", "") for e in events))
+    page_views = len([e for e in events if e.get("event") == "$pageview"])
+    custom_events = len(
+        [e for e in events if e.get("event") not in ["$pageview", "$pageleave"]]
+    )
+    sessions = len(
+        set(
+            e.get("properties", {}).get("$session_id", "")
+            for e in events
+            if e.get("properties", {}).get("$session_id")
+        )
+    )
+
+    one_hour_ago = datetime.now(timezone.utc) - timedelta(hours=1)
+    events_1h = len(
+        [
+            e
+            for e in events
+            if datetime.fromisoformat(e.get("timestamp", "").replace("Z", "+00:00"))
+            > one_hour_ago
+        ]
+    )
+
+    return {
+        "events_24h": len(events),
+        "unique_users_24h": unique_users,
+        "page_views_24h": page_views,
+        "custom_events_24h": custom_events,
+        "sessions_24h": sessions,
+        "events_1h": events_1h,
+    }
+
+
 def fetch_posthog_metrics():
     """Fetch metrics from PostHog API"""
     api_key, project_id, host = get_posthog_config()
@@ -225,7 +382,28 @@ def fetch_posthog_metrics():
             "limit": "100",
         }
 
-        response = requests.get(events_url, headers=headers, params=params, timeout=5)
+        # The aggregate query and the events list (needed for the activity feed
+        # and as the fallback) are independent, so issue them concurrently.
+        with ThreadPoolExecutor(max_workers=2) as executor:
+            aggregates_future = executor.submit(
+                fetch_posthog_aggregates, host, project_id, headers
+            )
+            events_future = executor.submit(
+                requests.get, events_url, headers=headers, params=params, timeout=5
+            )
+            response = events_future.result()
+            try:
+                aggregates = aggregates_future.result()
+            except (
+                requests.exceptions.RequestException,
+                ValueError,
+                TypeError,
+                IndexError,
+                KeyError,
+            ) as e:
+                # Also covers a malformed HogQL results payload
+                logger.warning("PostHog aggregate query failed: %s", e)
+                aggregates = None
 
         if response.status_code == 401:
             return None, "PostHog API error: 401 - Invalid API key"
@@ -245,31 +423,11 @@ def fetch_posthog_metrics():
                 data = response.json()
                 events = data.get("results", [])
 
-        # Calculate statistics
-        events_24h = len(events)
-        unique_users = len(set(e.get("distinct_id", "") for e in events))
-        page_views = len([e for e in events if e.get("event") == "$pageview"])
-        custom_events = len(
-            [e for e in events if e.get("event") not in ["$pageview", "$pageleave"]]
-        )
-        sessions = len(
-            set(
-                e.get("properties", {}).get("$session_id", "")
-                for e in events
-                if e.get("properties", {}).get("$session_id")
-            )
-        )
-
-        one_hour_ago = datetime.now(timezone.utc) - timedelta(hours=1)
-        events_1h = len(
-            [
-                e
-                for e in events
-                if datetime.fromisoformat(e.get("timestamp", "").replace("Z", "+00:00"))
-                > one_hour_ago
-            ]
-        )
+        if aggregates is None:
+            aggregates = compute_event_metrics(events)
 
+        events_24h = aggregates["events_24h"]
+        unique_users = aggregates["unique_users_24h"]
         avg_events_per_user = round(events_24h / unique_users, 1) if unique_users > 0 else 0
 
         # Get recent events for activity feed
@@ -285,12 +443,7 @@ def fetch_posthog_metrics():
             )
 
         return {
-            "events_24h": events_24h,
-            "unique_users_24h": unique_users,
-            "page_views_24h": page_views,
-            "custom_events_24h": custom_events,
-            "sessions_24h": sessions,
-            "events_1h": events_1h,
+            **aggregates,
             "avg_events_per_user": avg_events_per_user,
             "recent_events": recent_events,
             "demo_mode": False,
@@ -305,21 +458,89 @@ def fetch_posthog_metrics():
         return None, "FETCH_ERROR"
 
 
+# Seconds between background PostHog refreshes once the refresher is running
+METRICS_REFRESH_INTERVAL = 30
+
+# fetched_at is when the snapshot was fetched from PostHog, not when it is served
+_metrics_snapshot = {"metrics": None, "error": None, "fetched_at": None}
+_metrics_snapshot_lock = threading.Lock()
+_metrics_snapshot_ready = threading.Event()
+# Set to cut the refresher's sleep short; repeated requests coalesce
+_metrics_refresh_requested = threading.Event()
+_metrics_refresher_thread = None
+
+
+def refresh_metrics_snapshot():
+    """Fetch PostHog metrics and publish them as the shared snapshot"""
+    metrics, error = fetch_posthog_metrics()
+    fetched_at = datetime.now(timezone.utc).isoformat()
+    with _metrics_snapshot_lock:
+        _metrics_snapshot.update(metrics=metrics, error=error, fetched_at=fetched_at)
+    _metrics_snapshot_ready.set()
+
+
+def _metrics_refresher():
+    while True:
+        _metrics_refresh_requested.clear()
+        try:
+            refresh_metrics_snapshot()
+        except Exception as e:
+            logger.error("Metrics refresh failed: %s", e)
+        _metrics_refresh_requested.wait(METRICS_REFRESH_INTERVAL)
+
+
+def request_metrics_refresh():
+    """Ask the refresher to fetch now instead of at the next interval"""
+    _metrics_refresh_requested.set()
+
+
+def start_metrics_refresher():
+    """Start the background thread that keeps the metrics snapshot fresh"""
+    global _metrics_refresher_thread
+    if _metrics_refresher_thread is None:
+        _metrics_refresher_thread = threading.Thread(
+            target=_metrics_refresher, name="metrics-refresher", daemon=True
+        )
+        _metrics_refresher_thread.start()
+
+
+def get_posthog_metrics():
+    """Get PostHog metrics from the background snapshot.
+
+    Falls back to a blocking fetch when the refresher isn't running (tests,
+    WSGI imports) or hasn't produced its first snapshot in time. The metrics
+    carry a last_updated timestamp of when they were fetched.
+    """
+    if _metrics_refresher_thread is None or not _metrics_snapshot_ready.wait(timeout=10):
+        metrics, error = fetch_posthog_metrics()
+        fetched_at = datetime.now(timezone.utc).isoformat()
+    else:
+        with _metrics_snapshot_lock:
+            metrics = _metrics_snapshot["metrics"]
+            error = _metrics_snapshot["error"]
+            fetched_at = _metrics_snapshot.get("fetched_at")
+
+    if metrics is None:
+        return None, error
+    # Callers decorate the result, so never hand out the shared dict
+    return {**metrics, "last_updated": fetched_at}, error
+
+
 def fetch_dashboard_stats(layout_name):
     """Fetch and format stats for any dashboard layout."""
     layout_info = LAYOUT_POSITION_MAPS[layout_name]
-    metrics, error = fetch_posthog_metrics()
+    metrics, error = get_posthog_metrics()
 
     if error:
         return None, error
 
-    config = config_manager.get_config()
+    config = config_manager.get_config_view()
     layout_config = config.get("display", {}).get("metrics", {}).get(layout_name, {})
 
     response = {"demo_mode": metrics.get("demo_mode", False)}
 
     if layout_info["extras"].get("lastUpdated"):
-        response["lastUpdated"] = datetime.now(timezone.utc).isoformat()
+        response["lastUpdated"] = metrics["last_updated"]
     if layout_info["extras"].get("recent_events"):
         response["recent_events"] = metrics.get("recent_events", [])
 
@@ -356,14 +577,13 @@ def get_layout_stats(layout):
 @app.route("/api/stats")
 def get_stats():
     """Get all PostHog metrics (layout-agnostic)."""
-    metrics, error = fetch_posthog_metrics()
+    metrics, error = get_posthog_metrics()
 
     if error:
         if error == "NETWORK_ERROR":
             return jsonify({"error": "network_lost", "redirect": "/setup"}), 503
         return jsonify({"error": error}), 500
 
-    metrics["last_updated"] = datetime.now(timezone.utc).isoformat()
     return jsonify(metrics)
 
 
@@ -374,8 +594,6 @@ def health_check():
     ap_mode = False
 
     # Check for active network connection (ethernet or wifi)
-    import subprocess
-
     try:
         # Check if we have any active network connection with internet access
         result = subprocess.run(
@@ -402,8 +620,6 @@ def health_check():
 @app.route("/api/network/scan")
 def scan_networks():
     """Scan for available WiFi networks"""
-    import subprocess
-    
     networks = []
     try:
         # Use iwlist to scan for networks (works better in AP mode)
@@ -458,8 +674,6 @@ def scan_networks():
 @require_admin
 def connect_network():
     """Connect to a WiFi network"""
-    import subprocess
-    import re
 
     data = request.get_json()
     ssid = data.get("ssid")
@@ -468,14 +682,13 @@ def connect_network():
     if not ssid:
         return jsonify({"success": False, "error": "SSID is required"}), 400
 
-    # Validate SSID: 1-32 chars, printable ASCII, no quotes or backslashes
-    if not re.match(r'^[a-zA-Z0-9 _\-\.]{1,32}$', ssid):
+    if not SSID_RE.match(ssid):
         return jsonify({"success": False, "error": "Invalid SSID format"}), 400
 
     # Validate password: 8-63 chars for WPA, printable ASCII only
     if password and (len(password) < 8 or len(password) > 63):
         return jsonify({"success": False, "error": "Password must be 8-63 characters"}), 400
-    if password and not re.match(r'^[\x20-\x7E]+$', password):
+    if password and not WPA_PASSWORD_RE.match(password):
         return jsonify({"success": False, "error": "Password contains invalid characters"}), 400
 
     try:
@@ -494,13 +707,10 @@ def connect_network():
             timeout=10
         )
         
-        # Stop AP mode if active
+        # Stop AP mode if active; the response doesn't depend on it finishing
         if os.path.exists("/tmp/wifi_ap_mode"):
-            subprocess.run(
-                ["sudo", f"{os.path.dirname(os.path.abspath(__file__))}/../scripts/wifi-ap-manager.sh", "stop"],
-                timeout=10
-            )
-            
+            run_ap_manager("stop")
+
         return jsonify({"success": True, "message": "Connecting to network..."})
         
     except Exception as e:
@@ -511,45 +721,41 @@ def connect_network():
 @app.route("/api/network/status")
 def network_status():
     """Check network and AP mode status"""
-    import subprocess
-
     # Check network connectivity first
     has_network = False
     has_ethernet = False
     wifi_ssid = ""
     wifi_signal = "0%"
-    
-    try:
-        # Check for internet connectivity
-        result = subprocess.run(
-            ["ping", "-c", "1", "-W", "2", "8.8.8.8"], capture_output=True, timeout=3
-        )
-        has_network = result.returncode == 0
 
-        # Check if ethernet is connected
-        eth_result = subprocess.run(
-            ["ip", "link", "show", "eth0"], capture_output=True, text=True, timeout=2
-        )
-        if eth_result.returncode == 0 and "state UP" in eth_result.stdout:
-            has_ethernet = True
-            
-        # Get WiFi status
-        wifi_result = subprocess.run(
-            ["iwconfig", "wlan0"], capture_output=True, text=True, timeout=2
-        )
-        if wifi_result.returncode == 0:
-            for line in wifi_result.stdout.split("\n"):
-                if "ESSID:" in line:
-                    wifi_ssid = line.split('ESSID:"')[1].split('"')[0] if 'ESSID:"' in line else ""
-                if "Link Quality" in line:
-                    # Extract signal quality percentage
-                    try:
-                        quality = line.split("Link Quality=")[1].split()[0]
-                        wifi_signal = quality
-                    except:
-                        wifi_signal = "0%"
-    except (subprocess.TimeoutExpired, subprocess.SubprocessError):
-        pass
+    # The probes are independent, so run them side by side instead of
+    # paying for each timeout in turn
+    ping_result, eth_result, wifi_result, addr_result = run_probes(
+        (["ping", "-c", "1", "-W", "2", "8.8.8.8"], 3),
+        (["ip", "link", "show", "eth0"], 2),
+        (["iwconfig", "wlan0"], 2),
+        (["ip", "addr", "show"], 2),
+    )
+
+    # Check for internet connectivity
+    if ping_result:
+        has_network = ping_result[0] == 0
+
+    # Check if ethernet is connected
+    if eth_result and eth_result[0] == 0 and "state UP" in eth_result[1]:
+        has_ethernet = True
+
+    # Get WiFi status
+    if wifi_result and wifi_result[0] == 0:
+        for line in wifi_result[1].split("\n"):
+            if "ESSID:" in line:
+                wifi_ssid = line.split('ESSID:"')[1].split('"')[0] if 'ESSID:"' in line else ""
+            if "Link Quality" in line:
+                # Extract signal quality percentage
+                try:
+                    quality = line.split("Link Quality=")[1].split()[0]
+                    wifi_signal = quality
+                except IndexError:
+                    wifi_signal = "0%"
 
     # Check AP mode
     ap_mode = os.path.exists("/tmp/wifi_ap_mode")
@@ -557,22 +763,17 @@ def network_status():
     # Get current IP addresses
     ips = []
     connection_type = "none"
-    try:
-        result = subprocess.run(["ip", "addr", "show"], capture_output=True, text=True, timeout=2)
-        if result.returncode == 0:
-            for line in result.stdout.split("\n"):
-                if "inet " in line and "127.0.0.1" not in line:
-                    ip = line.strip().split()[1].split("/")[0]
-                    ips.append(ip)
-                    # Determine connection type
-                    if "eth0" in line:
-                        connection_type = "ethernet"
-                    elif "wlan0" in line or "wlan1" in line:
-                        if not ap_mode:
-                            connection_type = "wifi"
-
-    except (subprocess.TimeoutExpired, subprocess.SubprocessError):
-        pass
+    if addr_result and addr_result[0] == 0:
+        for line in addr_result[1].split("\n"):
+            if "inet " in line and "127.0.0.1" not in line:
+                ip = line.strip().split()[1].split("/")[0]
+                ips.append(ip)
+                # Determine connection type
+                if "eth0" in line:
+                    connection_type = "ethernet"
+                elif "wlan0" in line or "wlan1" in line:
+                    if not ap_mode:
+                        connection_type = "wifi"
 
     # Format response to match frontend expectations
     return jsonify(
@@ -614,10 +815,23 @@ def check_for_updates():
 @require_admin
 def apply_update():
     """Apply OTA update"""
+    # ?async=1 returns a job ID right away instead of holding the request
+    if request.args.get("async") == "1":
+        return jsonify(ota_manager.perform_update_async()), 202
     result = ota_manager.perform_update()
     return jsonify(result)
 
 
+@app.route("/api/admin/ota/jobs/<job_id>")
+@require_admin
+def get_ota_job(job_id):
+    """Get the status of a background OTA job"""
+    job = ota_manager.get_job(job_id)
+    if job is None:
+        return jsonify({"error": "Job not found"}), 404
+    return jsonify(job)
+
+
 @app.route("/api/admin/ota/config", methods=["GET", "POST"])
 @require_admin
 def ota_config():
@@ -810,6 +1024,10 @@ def update_config():
     if not config_manager.update_config(data):
         return jsonify({"success": False, "error": "Failed to update config"}), 500
 
+    # Don't keep serving metrics fetched with the old credentials
+    if "posthog" in data:
+        request_metrics_refresh()
+
     return jsonify({"success": True})
 
 
@@ -854,7 +1072,13 @@ def validate_posthog_config():
 
         # Try to fetch project info to validate credentials
         test_url = f"{host}/api/projects/{project_id}/"
-        response = requests.get(test_url, headers=headers, timeout=10)
+        # Only the status code matters, so skip the body; fall back to GET
+        # for servers that don't allow HEAD
+        response = _posthog_session.head(
+            test_url, headers=headers, timeout=(3, 5), allow_redirects=True
+        )
+        if response.status_code == 405:
+            response = _posthog_session.get(test_url, headers=headers, timeout=(3, 5))
 
         if response.status_code == 200:
             return jsonify({"valid": True, "message": "PostHog connection successful"})
@@ -903,6 +1127,7 @@ def delete_config():
     """Clear PostHog credentials from the device config."""
     try:
         config_manager.update_config({"posthog": {"api_key": "", "project_id": "", "host": "https://app.posthog.com"}})
+        request_metrics_refresh()
         return jsonify({"success": True, "message": "Configuration deleted successfully"})
     except Exception as e:
         logger.error("Config deletion error: %s", e)
@@ -910,28 +1135,36 @@ def delete_config():
 
 
 # Serve static files (JS, CSS, images)
+# React build assets carry a content hash in their names, so they never change
+HASHED_ASSET_MAX_AGE = 31536000
+# Unhashed files are revalidated via ETag/Last-Modified after this
+UNHASHED_ASSET_MAX_AGE = 3600
+
+
 @app.route("/static/<path:path>")
 def serve_static(path):
     """Serve static files from React build"""
-    return send_from_directory(os.path.join(app.static_folder, "static"), path)
+    return send_from_directory(
+        os.path.join(app.static_folder, "static"), path, max_age=HASHED_ASSET_MAX_AGE
+    )
 
 
 @app.route("/manifest.json")
 def serve_manifest():
     """Serve manifest.json"""
-    return send_from_directory(app.static_folder, "manifest.json")
+    return send_from_directory(app.static_folder, "manifest.json", max_age=UNHASHED_ASSET_MAX_AGE)
 
 
 @app.route("/favicon.ico")
 def serve_favicon():
     """Serve favicon.ico"""
-    return send_from_directory(app.static_folder, "favicon.ico")
+    return send_from_directory(app.static_folder, "favicon.ico", max_age=UNHASHED_ASSET_MAX_AGE)
 
 
 @app.route("/robots.txt")
 def serve_robots():
     """Serve robots.txt"""
-    return send_from_directory(app.static_folder, "robots.txt")
+    return send_from_directory(app.static_folder, "robots.txt", max_age=UNHASHED_ASSET_MAX_AGE)
 
 
 # Serve layout preview images
@@ -939,12 +1172,39 @@ def serve_robots():
 def serve_layout_preview(filename):
     """Serve layout preview images"""
     preview_dir = os.path.join(app.static_folder, "layout-previews")
-    if os.path.exists(os.path.join(preview_dir, filename)):
-        return send_from_directory(preview_dir, filename)
-    else:
+    # send_from_directory stats the file itself, so let it report a miss
+    try:
+        return send_from_directory(preview_dir, filename, max_age=UNHASHED_ASSET_MAX_AGE)
+    except NotFound:
         return "Image not found", 404
 
 
+_build_files_cache = {}
+_build_files_lock = threading.Lock()
+
+
+def list_build_files(directory, extension):
+    """List hashed main.* build files, cached until the directory changes"""
+    try:
+        mtime = os.stat(directory).st_mtime_ns
+    except OSError:
+        return []
+
+    with _build_files_lock:
+        cached = _build_files_cache.get(directory)
+        if cached is None or cached[0] != mtime:
+            files = [
+                f for f in os.listdir(directory) if f.startswith("main.") and f.endswith(extension)
+            ]
+            cached = (mtime, files)
+            _build_files_cache[directory] = cached
+        return cached[1]
+
+
+# (cache key, html) of the last rendered index page
+_rendered_index = None
+
+
 # Serve React App for all other routes - This MUST be after all API and static routes
 @app.route("/", defaults={"path": ""})
 @app.route("/<path:path>")
@@ -954,8 +1214,20 @@ def serve_react_app(path):
     if path.startswith("api/"):
         return jsonify({"error": "Not found"}), 404
 
+    # Find the actual build files (they have hashes in the names)
+    js_files = list_build_files(os.path.join(app.static_folder, "static", "js"), ".js")
+    css_files = list_build_files(os.path.join(app.static_folder, "static", "css"), ".css")
+
+    # The page only changes with the config or a new build, so reuse the last
+    # render until either moves
+    global _rendered_index
+    cache_key = (config_manager.get_config_hash(), tuple(js_files), tuple(css_files))
+    cached = _rendered_index
+    if cached is not None and cached[0] == cache_key and not app.debug:
+        return cached[1]
+
     # Get current display config and theme
-    config = config_manager.get_config()
+    config = config_manager.get_config_view()
     display_config = config.get("display", {})
     theme_id = display_config.get("theme", "dark")
 
@@ -964,36 +1236,21 @@ def serve_react_app(path):
     if theme_id and theme_id not in ["dark", "light"]:
         theme_data = theme_manager.get_theme(theme_id)
 
-    # Find the actual build files (they have hashes in the names)
-    js_files = []
-    css_files = []
-
-    static_js_path = os.path.join(app.static_folder, "static", "js")
-    static_css_path = os.path.join(app.static_folder, "static", "css")
-
-    if os.path.exists(static_js_path):
-        for file in os.listdir(static_js_path):
-            if file.startswith("main.") and file.endswith(".js") and not file.endswith(".map"):
-                js_files.append(file)
-
-    if os.path.exists(static_css_path):
-        for file in os.listdir(static_css_path):
-            if file.startswith("main.") and file.endswith(".css") and not file.endswith(".map"):
-                css_files.append(file)
-
     # For all routes (including /config, /setup), serve index.html with embedded data
     # This allows React Router to handle client-side routing
-    return render_template(
+    html = render_template(
         "index.html",
         theme_data=theme_data,
         display_config=display_config,
         js_files=js_files,
         css_files=css_files,
     )
+    _rendered_index = (cache_key, html)
+    return html
 
 
-if __name__ == "__main__":
-    # Perform boot update check if enabled
+def _boot_update_worker():
+    """Perform boot update check if enabled"""
     try:
         boot_result = ota_manager.perform_boot_update()
         if boot_result.get("error"):
@@ -1003,6 +1260,13 @@ if __name__ == "__main__":
     except Exception as e:
         logger.error("Boot update check failed: %s", e)
 
+
+if __name__ == "__main__":
+    # Check for updates in the background so the server binds right away
+    threading.Thread(target=_boot_update_worker, name="boot-update", daemon=True).start()
+
+    start_metrics_refresher()
+
     # Check if we're in debug mode
     debug_mode = os.environ.get("FLASK_DEBUG", "0") == "1"
 
@@ -3,14 +3,39 @@ import hashlib
 import json
 import logging
 import os
-from typing import Dict, Any, Optional
+import threading
+from types import MappingProxyType
+from typing import Dict, Any, Mapping, Optional, Tuple
+
+# orjson is an optional speed-up; it has no wheels for the Pi Zero's armv6
+try:
+    import orjson
+
+    ORJSON_AVAILABLE = True
+except ImportError:
+    ORJSON_AVAILABLE = False
 
 logger = logging.getLogger(__name__)
 
 
+def _encode_config(config: Dict[str, Any]) -> bytes:
+    """Serialize config as indented JSON bytes"""
+    if ORJSON_AVAILABLE:
+        return orjson.dumps(config, option=orjson.OPT_INDENT_2)
+    return json.dumps(config, indent=2).encode()
+
+
+def _decode_config(data: bytes) -> Dict[str, Any]:
+    """Parse config JSON bytes"""
+    if ORJSON_AVAILABLE:
+        return orjson.loads(data)
+    return json.loads(data)
+
+
 class ConfigManager:
     def __init__(self, config_file: str = "device_config.json"):
         self.config_file = config_file
+        self._save_lock = threading.Lock()
         self.default_config = {
             "posthog": {
                 "api_key": "",
@@ -76,17 +101,27 @@ class ConfigManager:
                 "update_schedule": "0 3 * * *",  # Default: 3 AM daily
                 "backup_before_update": True,
                 "max_backups": 5,
+                "skip_ls_remote_fast_path": False,
+                "shallow": False,
             },
             "custom_themes": {},  # Store custom themes here
         }
+        # Bumped by every save; a cached hash is only valid for the
+        # generation it was computed in
+        self._config_generation = 0
+        self._config_hash: Optional[Tuple[int, str]] = None
+        # Bytes last written to (or read from) config_file
+        self._saved_data: Optional[bytes] = None
         self.config = self.load_config()
 
     def load_config(self) -> Dict[str, Any]:
         """Load configuration from file or create with defaults"""
         if os.path.exists(self.config_file):
             try:
-                with open(self.config_file, "r") as f:
-                    loaded_config = json.load(f)
+                with open(self.config_file, "rb") as f:
+                    data = f.read()
+                    loaded_config = _decode_config(data)
+                    self._saved_data = data
                     # Merge with defaults to ensure all keys exist
                     return self._merge_configs(self.default_config, loaded_config)
             except Exception as e:
@@ -98,28 +133,64 @@ class ConfigManager:
             return self.default_config.copy()
 
     def _merge_configs(self, default: Dict, loaded: Dict) -> Dict:
+        # Copy once at the root, then merge in place with an explicit stack
+        # rather than recursing (and re-copying) at every level
         result = copy.deepcopy(default)
-        for key, value in loaded.items():
-            if key in result and isinstance(result[key], dict) and isinstance(value, dict):
-                result[key] = self._merge_configs(result[key], value)
-            else:
-                result[key] = value
+        stack = [(result, loaded)]
+        while stack:
+            dst, src = stack.pop()
+            for key, value in src.items():
+                if isinstance(value, dict) and isinstance(dst.get(key), dict):
+                    stack.append((dst[key], value))
+                else:
+                    dst[key] = value
         return result
 
     def save_config(self, config: Optional[Dict[str, Any]] = None) -> bool:
         """Save configuration to file"""
-        try:
-            config_to_save = config if config is not None else self.config
-            with open(self.config_file, "w") as f:
-                json.dump(config_to_save, f, indent=2)
-            return True
-        except Exception as e:
-            logger.error("Error saving config: %s", e)
-            return False
+        tmp_file = f"{self.config_file}.tmp"
+        # Request threads, the boot-update thread and OTA jobs all save; one
+        # writer at a time so they can't interleave in the shared temp file
+        with self._save_lock:
+            # Every mutator persists through here after changing self.config,
+            # so this is where the cached hash goes stale
+            self._config_generation += 1
+            try:
+                config_to_save = config if config is not None else self.config
+                data = _encode_config(config_to_save)
+                # Skip rewriting identical content to spare the SD card
+                if data == self._saved_data:
+                    return True
+
+                # Write to a temp file and rename over the original so a power
+                # cut can never leave a truncated config behind
+                with open(tmp_file, "wb") as f:
+                    f.write(data)
+                    f.flush()
+                    os.fsync(f.fileno())
+                os.replace(tmp_file, self.config_file)
+                self._saved_data = data
+                return True
+            except Exception as e:
+                logger.error("Error saving config: %s", e)
+                try:
+                    os.remove(tmp_file)
+                except OSError:
+                    pass
+                return False
 
     def get_config(self) -> Dict[str, Any]:
         return copy.deepcopy(self.config)
 
+    def get_config_view(self) -> Mapping[str, Any]:
+        """Read-only view of the live config without copying it.
+
+        Only the top level is write-protected; nested sections are shared with
+        the manager, so callers must go through update_config to change them.
+        update_config swaps in a new dict, so fetch a fresh view per use.
+        """
+        return MappingProxyType(self.config)
+
     def update_config(self, updates: Dict[str, Any]) -> bool:
         """Update configuration with new values"""
         try:
@@ -144,11 +215,20 @@ class ConfigManager:
 
     def get_config_hash(self) -> str:
         """Calculate hash of current configuration for change detection"""
+        cached = self._config_hash
+        generation = self._config_generation
+        if cached is not None and cached[0] == generation:
+            return cached[1]
         # Create a stable string representation of config
         # Sort keys to ensure consistent hashing
         config_str = json.dumps(self.config, sort_keys=True)
-        # Return first 8 characters of SHA256 hash for brevity
-        return hashlib.sha256(config_str.encode()).hexdigest()[:8]
+        # Keep first 8 characters of SHA256 hash for brevity
+        config_hash = hashlib.sha256(config_str.encode()).hexdigest()[:8]
+        # Tagged with the generation read before serializing: if a save
+        # lands meanwhile, this hash may be of the old config and is
+        # recomputed on the next call instead of sticking
+        self._config_hash = (generation, config_hash)
+        return config_hash
 
     def get_ota_config(self) -> Dict[str, Any]:
         """Get OTA configuration"""
@@ -1,21 +1,128 @@
+import getpass
 import logging
+import math
 import os
 import re
 import shutil
 import subprocess
+import tarfile
 import tempfile
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor
 from datetime import datetime
-from typing import Dict, Any, List, Optional
+from functools import wraps
+from logging.handlers import RotatingFileHandler
+from typing import Dict, Any, List, Optional, Tuple
 
 logger = logging.getLogger(__name__)
 
+BRANCH_NAME_RE = re.compile(r"^[a-zA-Z0-9][a-zA-Z0-9._/-]*$")
+# Each cron field: number, range, list, step, or wildcard
+CRON_FIELD_RE = re.compile(r"^(\*|[0-9]{1,2})([-/,][0-9]{1,2})*$")
+# Edits to tracked files don't touch .git/index, so cached results expire
+STATUS_CACHE_TTL = 60
+# Refs fetched this recently are fresh enough for listing and switching branches
+FETCH_MAX_AGE = 60
+# Nothing reads FETCH_HEAD, and a gc/repack on the SD card can take minutes;
+# the commit-graph speeds up the HEAD..origin comparisons (needs git >= 2.29)
+GIT_FETCH = [
+    "git",
+    "-c",
+    "fetch.writeCommitGraph=true",
+    "fetch",
+    "--no-write-fetch-head",
+    "--no-auto-gc",
+]
+# With the "shallow" option, fetch only recent history; updates deepen it
+# when a device is too far behind for the two histories to meet
+SHALLOW_FETCH_ARGS = ["--depth=20", "--no-tags"]
+# pull merges from FETCH_HEAD, so it keeps writing it
+GIT_PULL = ["git", "-c", "fetch.writeCommitGraph=true", "-c", "gc.auto=0", "pull"]
+# Directory names left out of backups, at any depth
+BACKUP_EXCLUDES = frozenset({".git", "node_modules", "__pycache__", "venv", ".backups"})
+# Directories clean_cache doesn't descend into
+CLEAN_CACHE_SKIP_DIRS = frozenset({"__pycache__", ".git", "node_modules"})
+
+
+def _backup_filter(tarinfo: tarfile.TarInfo) -> Optional[tarfile.TarInfo]:
+    """Drop excluded entries; returning None for a directory skips its contents"""
+    if os.path.basename(tarinfo.name) in BACKUP_EXCLUDES:
+        return None
+    return tarinfo
+
+
+def _ota_file_logger(log_file: str) -> logging.Logger:
+    """Logger writing to log_file through one long-lived rotating handler"""
+    path = os.path.abspath(log_file)
+    ota_logger = logging.getLogger(f"ota.{path}")
+    if not ota_logger.handlers:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        handler = RotatingFileHandler(path, maxBytes=1_000_000, backupCount=3)
+        handler.setFormatter(logging.Formatter("%(asctime)s - %(message)s"))
+        ota_logger.addHandler(handler)
+        ota_logger.setLevel(logging.INFO)
+        ota_logger.propagate = False
+    return ota_logger
+
+
+def _human_size(num_bytes: int) -> str:
+    """Format a byte count like `df -h` (1024-based, e.g. 512M, 3.2G, 29G)"""
+    size = float(num_bytes)
+    for unit in ("", "K", "M", "G", "T"):
+        if size < 1024 or unit == "T":
+            break
+        size /= 1024
+    # df rounds up, so a nearly full disk never reads as having room
+    if unit and math.ceil(size * 10) < 100:
+        return f"{math.ceil(size * 10) / 10:.1f}{unit}"
+    return f"{math.ceil(size)}{unit}"
+
+
+def exclusive_operation(method):
+    """Refuse to start a repo-changing operation while another is running"""
+
+    @wraps(method)
+    def wrapper(self, *args, **kwargs):
+        if not self._operation_lock.acquire(blocking=False):
+            return {"error": "Another OTA operation is in progress", "success": False}
+        try:
+            return method(self, *args, **kwargs)
+        finally:
+            self._operation_lock.release()
+
+    return wrapper
+
 
 class OTAManager:
+    # Shared by every manager so long git/tar work never runs on a request thread
+    _executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix="ota")
+    # Background jobs kept for polling; finished ones are dropped once read
+    MAX_JOBS = 16
+
     def __init__(self, config_manager):
         self.config_manager = config_manager
         self.repo_path = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
         self.backup_dir = os.path.join(self.repo_path, ".backups")
         self.log_file = "/var/log/pi-analytics-ota.log"
+        self.cron_file = "/etc/cron.d/pi-analytics-ota"
+        # Held while the working tree is being changed; the boot update runs
+        # in a background thread and may overlap admin requests
+        self._operation_lock = threading.Lock()
+        # Resolved once rather than searching PATH on every call
+        self._git_path = shutil.which("git") or "git"
+        # Read-only commands skip .git/index.lock so status polls don't
+        # contend with each other, and nothing ever waits on a credential prompt
+        self._git_env = {**os.environ, "GIT_OPTIONAL_LOCKS": "0", "GIT_TERMINAL_PROMPT": "0"}
+        # (index/HEAD mtimes, timestamp, has_changes) of the last git status
+        self._status_cache = None
+        # ((HEAD sha, remote sha), commit messages) of the last update check
+        self._pending_cache = None
+        # job ID -> Future, oldest first so the cap evicts stale jobs
+        self._jobs: "OrderedDict[str, Future]" = OrderedDict()
+        self._jobs_lock = threading.Lock()
 
         # Ensure backup directory exists
         os.makedirs(self.backup_dir, exist_ok=True)
@@ -26,16 +133,11 @@ class OTAManager:
 
         # Get current Git status
         try:
-            current_branch = self._run_command(
-                ["git", "branch", "--show-current"], cwd=self.repo_path
-            ).strip()
-            current_commit = self._run_command(
-                ["git", "rev-parse", "HEAD"], cwd=self.repo_path
-            ).strip()[:8]
+            current_branch, current_commit = self._read_head()
+            current_commit = current_commit[:8]
 
             # Check if there are uncommitted changes
-            status_output = self._run_command(["git", "status", "--porcelain"], cwd=self.repo_path)
-            has_changes = bool(status_output.strip())
+            has_changes = self._has_changes_cached()
 
         except Exception:
             current_branch = "unknown"
@@ -57,36 +159,41 @@ class OTAManager:
     def check_for_updates(self) -> Dict[str, Any]:
         """Check for available updates"""
         try:
-            # Fetch latest from remote
-            self._run_command(["git", "fetch"], cwd=self.repo_path)
-
             config = self.config_manager.get_ota_config()
             target_branch = config.get("branch", "main")
 
-            # Get current and remote commits
-            current_commit = self._run_command(
-                ["git", "rev-parse", "HEAD"], cwd=self.repo_path
-            ).strip()
+            # Fetch latest from remote, unless a single ref advertisement
+            # shows our copy of the remote branch is already current
+            if config.get("skip_ls_remote_fast_path", False):
+                self._fetch_if_stale()
+            elif not self._remote_tip_unchanged(target_branch):
+                self._fetch_if_stale(max_age=0)
 
-            remote_commit = self._run_command(
-                ["git", "rev-parse", f"origin/{target_branch}"], cwd=self.repo_path
-            ).strip()
-
-            # Get commit count difference
-            behind_count = self._run_command(
-                ["git", "rev-list", "--count", f"HEAD..origin/{target_branch}"],
-                cwd=self.repo_path,
-            ).strip()
+            # Get current and remote commits
+            _, current_commit = self._read_head()
+            remote_commit = self._resolve_ref(f"refs/remotes/origin/{target_branch}")
+            if remote_commit is None:
+                remote_commit = self._run_command(
+                    ["git", "rev-parse", f"origin/{target_branch}"], cwd=self.repo_path
+                ).strip()
 
-            # Get commit messages for updates
+            # Get commit messages for updates; one per commit, so the count
+            # falls out of the same call
             commit_messages = []
-            if int(behind_count) > 0:
-                messages = self._run_command(
-                    ["git", "log", "--oneline", f"HEAD..origin/{target_branch}"],
-                    cwd=self.repo_path,
-                ).strip()
-                if messages:
-                    commit_messages = messages.split("\n")
+            if current_commit != remote_commit:
+                # Commits are immutable, so the same pair always gives the same list
+                pair = (current_commit, remote_commit)
+                if self._pending_cache is not None and self._pending_cache[0] == pair:
+                    commit_messages = self._pending_cache[1]
+                else:
+                    messages = self._run_command(
+                        ["git", "log", "--format=%h %s", f"HEAD..origin/{target_branch}"],
+                        cwd=self.repo_path,
+                    ).strip()
+                    if messages:
+                        commit_messages = messages.split("\n")
+                    self._pending_cache = (pair, commit_messages)
+            behind_count = len(commit_messages)
 
             # Update last check time
             self.config_manager.update_ota_config({"last_check": datetime.now().isoformat()})
@@ -104,6 +211,7 @@ class OTAManager:
             logger.error("Update check failed: %s", e)
             return {"error": "Failed to check for updates", "update_available": False}
 
+    @exclusive_operation
     def perform_update(self, force: bool = False) -> Dict[str, Any]:
         """Perform OTA update"""
         try:
@@ -114,15 +222,23 @@ class OTAManager:
                 return {"error": "OTA updates are disabled"}
 
             # Check for uncommitted changes
-            status_output = self._run_command(["git", "status", "--porcelain"], cwd=self.repo_path)
-            if status_output.strip() and not force:
-                return {"error": "Uncommitted changes detected. Use force=true to override"}
-
-            # Create backup if configured
-            if config.get("backup_before_update", True):
-                backup_result = self.create_backup()
+            if not force:
+                if self._has_uncommitted_changes():
+                    return {"error": "Uncommitted changes detected. Use force=true to override"}
+
+            # The backup only reads the working tree and the fetch only writes
+            # under .git, so run them side by side
+            with ThreadPoolExecutor(max_workers=2) as executor:
+                fetch_future = executor.submit(self._fetch_if_stale)
+                backup_future = None
+                if config.get("backup_before_update", True):
+                    backup_future = executor.submit(self.create_backup)
+
+            if backup_future is not None:
+                backup_result = backup_future.result()
                 if not backup_result.get("success"):
                     return {"error": f"Backup failed: {backup_result.get('error')}"}
+            fetch_future.result()
 
             target_branch = config.get("branch", "main")
 
@@ -131,10 +247,11 @@ class OTAManager:
 
             # Checkout target branch
             self._run_command(["git", "checkout", target_branch], cwd=self.repo_path)
+            self._ensure_merge_base(target_branch)
 
             # Pull latest changes
             pull_output = self._run_command(
-                ["git", "pull", "origin", target_branch], cwd=self.repo_path
+                GIT_PULL + ["origin", target_branch], cwd=self.repo_path
             )
 
             # Update last update time
@@ -155,6 +272,31 @@ class OTAManager:
             logger.error("OTA update failed: %s", e)
             return {"error": "Update failed", "success": False}
 
+    def perform_update_async(self, force: bool = False) -> Dict[str, Any]:
+        """Start perform_update in the background and return its job ID"""
+        job_id = uuid.uuid4().hex
+        future = self._executor.submit(self.perform_update, force)
+        with self._jobs_lock:
+            self._jobs[job_id] = future
+            # Bound jobs nobody polls for
+            while len(self._jobs) > self.MAX_JOBS:
+                self._jobs.popitem(last=False)
+        return {"job_id": job_id}
+
+    def get_job(self, job_id: str) -> Optional[Dict[str, Any]]:
+        """Get the state of a background job, or None if it is unknown.
+
+        A finished job is forgotten once its result has been returned.
+        """
+        with self._jobs_lock:
+            future = self._jobs.get(job_id)
+            if future is None:
+                return None
+            if not future.done():
+                return {"status": "running", "result": None}
+            del self._jobs[job_id]
+        return {"status": "done", "result": future.result()}
+
     def perform_boot_update(self) -> Dict[str, Any]:
         """Perform update check on boot if configured"""
         config = self.config_manager.get_ota_config()
@@ -174,24 +316,25 @@ class OTAManager:
 
         return update_info
 
+    @exclusive_operation
     def switch_branch(self, branch: str) -> Dict[str, Any]:
         # Validate branch name format
-        if not re.match(r'^[a-zA-Z0-9][a-zA-Z0-9._/-]*$', branch):
+        if not BRANCH_NAME_RE.match(branch):
             return {"error": "Invalid branch name", "success": False}
 
         try:
             # Check for uncommitted changes
-            status_output = self._run_command(["git", "status", "--porcelain"], cwd=self.repo_path)
-            if status_output.strip():
+            if self._has_uncommitted_changes():
                 return {"error": "Uncommitted changes detected. Commit or stash changes first"}
 
             # Fetch latest
-            self._run_command(["git", "fetch"], cwd=self.repo_path)
+            self._fetch_if_stale()
 
             self._run_command(["git", "checkout", branch], cwd=self.repo_path)
+            self._ensure_merge_base(branch)
 
             # Pull latest
-            self._run_command(["git", "pull", "origin", branch], cwd=self.repo_path)
+            self._run_command(GIT_PULL + ["origin", branch], cwd=self.repo_path)
 
             # Update configuration
             self.config_manager.update_ota_config({"branch": branch})
@@ -206,7 +349,7 @@ class OTAManager:
         """Get list of available branches"""
         try:
             # Fetch latest
-            self._run_command(["git", "fetch"], cwd=self.repo_path)
+            self._fetch_if_stale()
 
             # Get all branches
             branches_output = self._run_command(["git", "branch", "-r"], cwd=self.repo_path).strip()
@@ -239,21 +382,22 @@ class OTAManager:
                 name = f"backup_{datetime.now().strftime('%Y%m%d_%H%M%S')}"
 
             backup_path = os.path.join(self.backup_dir, name)
+            archive_path = f"{backup_path}.tar.gz"
+            tmp_path = f"{archive_path}.tmp"
 
-            # Create backup excluding certain directories
-            exclude_dirs = [".git", "node_modules", "__pycache__", "venv", ".backups"]
-
-            # Create temporary tar file
-            with tempfile.NamedTemporaryFile(suffix=".tar.gz", delete=False) as tmp:
-                tar_cmd = (
-                    ["tar", "-czf", tmp.name]
-                    + [f"--exclude={d}" for d in exclude_dirs]
-                    + ["."]
-                )
-                self._run_command(tar_cmd, cwd=self.repo_path)
-
-                # Move to backup location
-                shutil.move(tmp.name, f"{backup_path}.tar.gz")
+            # Build the archive next to its final name so publishing it is a
+            # rename, not a copy from /tmp; level 1 is several times faster
+            # than the default on a Pi for much the same size on source files
+            try:
+                with tarfile.open(tmp_path, "w:gz", compresslevel=1) as tar:
+                    tar.add(self.repo_path, arcname=".", filter=_backup_filter)
+                os.replace(tmp_path, archive_path)
+            except Exception:
+                try:
+                    os.remove(tmp_path)
+                except OSError:
+                    pass
+                raise
 
             # Clean old backups if needed
             self._cleanup_old_backups()
@@ -261,13 +405,14 @@ class OTAManager:
             return {
                 "success": True,
                 "backup_name": name,
-                "path": f"{backup_path}.tar.gz",
+                "path": archive_path,
             }
 
         except Exception as e:
             logger.error("Backup creation failed: %s", e)
             return {"error": "Failed to create backup", "success": False}
 
+    @exclusive_operation
     def rollback(self, backup_name: Optional[str] = None) -> Dict[str, Any]:
         """Rollback to a previous backup"""
         try:
@@ -301,18 +446,15 @@ class OTAManager:
         try:
             backups = []
 
-            if os.path.exists(self.backup_dir):
-                for file in sorted(os.listdir(self.backup_dir), reverse=True):
-                    if file.endswith(".tar.gz"):
-                        path = os.path.join(self.backup_dir, file)
-                        stat = os.stat(path)
-                        backups.append(
-                            {
-                                "name": file.replace(".tar.gz", ""),
-                                "size": stat.st_size,
-                                "created": datetime.fromtimestamp(stat.st_mtime).isoformat(),
-                            }
-                        )
+            for entry in self._scan_backups():
+                stat = entry.stat()
+                backups.append(
+                    {
+                        "name": entry.name[: -len(".tar.gz")],
+                        "size": stat.st_size,
+                        "created": datetime.fromtimestamp(stat.st_mtime).isoformat(),
+                    }
+                )
 
             return {"backups": backups}
 
@@ -363,9 +505,7 @@ class OTAManager:
         fields = schedule.strip().split()
         if len(fields) != 5:
             return False
-        # Each field: number, range, list, step, or wildcard
-        field_re = re.compile(r'^(\*|[0-9]{1,2})([-/,][0-9]{1,2})*$')
-        return all(field_re.match(f) for f in fields)
+        return all(CRON_FIELD_RE.match(f) for f in fields)
 
     def update_cron_schedule(self, schedule: str) -> Dict[str, Any]:
         """Update cron schedule for automatic updates"""
@@ -376,38 +516,78 @@ class OTAManager:
             # Update config
             self.config_manager.update_ota_config({"update_schedule": schedule})
 
-            # Update crontab
             boot_script = os.path.join(self.repo_path, "scripts", "boot-update.py")
-            cron_cmd = f"{schedule} cd {self.repo_path} && /usr/bin/python3 {boot_script}"
+            job = f"cd {self.repo_path} && /usr/bin/python3 {boot_script}"
 
-            # Get current crontab
+            # Prefer a cron.d drop-in: one atomic write, no crontab round trip
             try:
-                current_cron = self._run_command(["crontab", "-l"])
-            except subprocess.CalledProcessError:
-                current_cron = ""
-
-            # Remove old OTA entries
-            new_cron = []
-            for line in current_cron.split("\n"):
-                if "boot-update.py" not in line:
-                    new_cron.append(line)
-
-            # Add new entry
-            new_cron.append(cron_cmd)
-
-            # Update crontab
-            with tempfile.NamedTemporaryFile(mode="w", delete=False) as tmp:
-                tmp.write("\n".join(new_cron))
-                tmp.flush()
-                self._run_command(["crontab", tmp.name])
-                os.unlink(tmp.name)
+                self._write_cron_file(f"{schedule} {getpass.getuser()} {job}\n")
+            except OSError:
+                # Not running as root (or no cron.d); use the user crontab.
+                # A drop-in left from earlier would run the update twice, so
+                # fail rather than keep it alongside the crontab entry.
+                try:
+                    os.remove(self.cron_file)
+                except FileNotFoundError:
+                    pass
+                self._update_crontab(f"{schedule} {job}")
+                return {"success": True, "schedule": schedule}
 
+            # Drop any crontab entry left from before the drop-in existed
+            try:
+                self._update_crontab(None)
+            except Exception as e:
+                logger.warning("Could not remove old crontab entry: %s", e)
             return {"success": True, "schedule": schedule}
 
         except Exception as e:
             logger.error("Cron schedule update failed: %s", e)
             return {"error": "Failed to update schedule", "success": False}
 
+    def _update_crontab(self, entry: Optional[str]):
+        """Replace the user crontab's OTA entry with entry, or just remove it"""
+        # Get current crontab
+        try:
+            current_cron = self._run_command(["crontab", "-l"])
+        except subprocess.CalledProcessError:
+            current_cron = ""
+
+        # Remove old OTA entries
+        new_cron = []
+        for line in current_cron.split("\n"):
+            if "boot-update.py" not in line:
+                new_cron.append(line)
+        if entry is None and len(new_cron) == len(current_cron.split("\n")):
+            return
+
+        # Add new entry
+        if entry is not None:
+            new_cron.append(entry)
+
+        # Update crontab
+        with tempfile.NamedTemporaryFile(mode="w", delete=False) as tmp:
+            tmp.write("\n".join(new_cron))
+            tmp.flush()
+            self._run_command(["crontab", tmp.name])
+            os.unlink(tmp.name)
+
+    def _write_cron_file(self, content: str):
+        """Atomically replace the cron.d drop-in"""
+        # cron skips names containing a dot, so the temp file is never run
+        cron_dir, name = os.path.split(self.cron_file)
+        tmp = os.path.join(cron_dir, f".{name}.{os.getpid()}")
+        try:
+            with open(tmp, "w") as f:
+                f.write(content)
+            os.chmod(tmp, 0o644)
+            os.replace(tmp, self.cron_file)
+        except OSError:
+            try:
+                os.remove(tmp)
+            except OSError:
+                pass
+            raise
+
     def test_git_connection(self) -> Dict[str, Any]:
         """Test Git connectivity"""
         try:
@@ -420,19 +600,20 @@ class OTAManager:
     def get_disk_usage(self) -> Dict[str, Any]:
         """Get disk usage information"""
         try:
-            df_output = self._run_command(["df", "-h", "/"])
-            lines = df_output.strip().split("\n")
-
-            if len(lines) > 1:
-                parts = lines[1].split()
-                return {
-                    "total": parts[1],
-                    "used": parts[2],
-                    "available": parts[3],
-                    "percent": parts[4],
-                }
-
-            return {}
+            st = os.statvfs("/")
+            total = st.f_blocks * st.f_frsize
+            used = (st.f_blocks - st.f_bfree) * st.f_frsize
+            available = st.f_bavail * st.f_frsize
+
+            # Same figures and formatting as `df -h /`, without the fork
+            usable = used + available
+            percent = -(-used * 100 // usable) if usable else 0
+            return {
+                "total": _human_size(total),
+                "used": _human_size(used),
+                "available": _human_size(available),
+                "percent": f"{percent}%",
+            }
 
         except Exception as e:
             logger.error("Disk usage check failed: %s", e)
@@ -443,11 +624,17 @@ class OTAManager:
         try:
             cleaned = []
 
-            # Clean Python cache
+            # Clean Python cache; collect first so the walk never descends
+            # into a cache dir (or .git/node_modules, which have none)
+            cache_dirs = []
             for root, dirs, files in os.walk(self.repo_path):
                 if "__pycache__" in dirs:
-                    shutil.rmtree(os.path.join(root, "__pycache__"))
-                    cleaned.append("Python cache")
+                    cache_dirs.append(os.path.join(root, "__pycache__"))
+                dirs[:] = [d for d in dirs if d not in CLEAN_CACHE_SKIP_DIRS]
+            for path in cache_dirs:
+                shutil.rmtree(path, ignore_errors=True)
+            if cache_dirs:
+                cleaned.append("Python cache")
 
             # Clean npm cache if exists
             try:
@@ -459,7 +646,7 @@ class OTAManager:
             except subprocess.CalledProcessError:
                 pass
 
-            return {"success": True, "cleaned": cleaned}
+            return {"success": True, "cleaned": cleaned, "python_cache_dirs": len(cache_dirs)}
 
         except Exception as e:
             logger.error("Cache clean failed: %s", e)
@@ -477,29 +664,213 @@ class OTAManager:
             logger.error("Failed to read logs: %s", e)
             return {"error": "Failed to read logs", "logs": []}
 
+    def _fetch_if_stale(self, remote: str = "origin", max_age: float = FETCH_MAX_AGE) -> bool:
+        """Fetch from remote unless the last fetch is under max_age seconds old"""
+        # Fetches don't write FETCH_HEAD, so their time is kept in a sentinel
+        sentinel = os.path.join(self.backup_dir, ".last_fetch")
+        try:
+            if time.time() - os.stat(sentinel).st_mtime < max_age:
+                return False
+        except OSError:
+            pass
+
+        self._run_command(GIT_FETCH + self._shallow_args() + [remote], cwd=self.repo_path)
+        try:
+            with open(sentinel, "a"):
+                pass
+            os.utime(sentinel)
+        except OSError:
+            pass
+        return True
+
+    def _shallow_args(self) -> List[str]:
+        """Extra fetch arguments when shallow OTA fetches are enabled"""
+        if self.config_manager.get_ota_config().get("shallow", False):
+            return SHALLOW_FETCH_ARGS
+        return []
+
+    def _ensure_merge_base(self, branch: str):
+        """Fetch full history when a shallow fetch stops short of HEAD"""
+        # More than 20 commits behind, the depth-limited origin history never
+        # reaches HEAD and the pull has no merge base to work from
+        if not os.path.exists(os.path.join(self.repo_path, ".git", "shallow")):
+            return
+        try:
+            self._run_command(
+                ["git", "merge-base", "HEAD", f"origin/{branch}"], cwd=self.repo_path
+            )
+        except subprocess.CalledProcessError:
+            self._log(f"No merge base with origin/{branch} in shallow history; unshallowing")
+            self._run_command(GIT_FETCH + ["--unshallow", "origin"], cwd=self.repo_path)
+
+    def _remote_tip_unchanged(self, branch: str) -> bool:
+        """Whether origin's branch tip matches our refs/remotes copy (no fetch needed)"""
+        try:
+            output = self._run_command(
+                ["git", "ls-remote", "--heads", "origin", f"refs/heads/{branch}"],
+                cwd=self.repo_path,
+            )
+        except subprocess.CalledProcessError:
+            return False
+        remote_tip = output.split("\t", 1)[0].strip()
+        return bool(remote_tip) and remote_tip == self._resolve_ref(
+            f"refs/remotes/origin/{branch}"
+        )
+
+    def _status_key(self) -> Optional[Tuple[int, int]]:
+        """mtimes of .git/index and .git/HEAD, which move whenever git state does"""
+        git_dir = os.path.join(self.repo_path, ".git")
+        try:
+            return (
+                os.stat(os.path.join(git_dir, "index")).st_mtime_ns,
+                os.stat(os.path.join(git_dir, "HEAD")).st_mtime_ns,
+            )
+        except OSError:
+            return None
+
+    def _has_changes_cached(self) -> bool:
+        """Dirty-tree check, reused while the index and HEAD are unchanged"""
+        key = self._status_key()
+        cached = self._status_cache
+        if (
+            key is not None
+            and cached is not None
+            and cached[0] == key
+            and time.monotonic() - cached[1] < STATUS_CACHE_TTL
+        ):
+            return cached[2]
+
+        has_changes = self._has_uncommitted_changes()
+        # Keyed on the state from before the walk, so a change made while it
+        # ran shows up as a cache miss next time
+        self._status_cache = (key, time.monotonic(), has_changes)
+        return has_changes
+
+    def _has_uncommitted_changes(self) -> bool:
+        """Whether tracked files differ from HEAD, stopping at the first change"""
+        cmd = [
+            self._git_path,
+            "-C",
+            self.repo_path,
+            "status",
+            "--porcelain=v2",
+            "-z",
+            "--untracked-files=no",
+        ]
+        proc = subprocess.Popen(
+            cmd,
+            stdin=subprocess.DEVNULL,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.DEVNULL,
+            env=self._git_env,
+            close_fds=False,
+        )
+        try:
+            # Any output at all means dirty; no need to let git finish the walk
+            first = proc.stdout.read(1)
+        finally:
+            if proc.poll() is None:
+                proc.terminate()
+            proc.stdout.close()
+            returncode = proc.wait()
+
+        if not first and returncode != 0:
+            raise subprocess.CalledProcessError(returncode, cmd)
+        return bool(first)
+
+    def _resolve_ref(self, ref: str) -> Optional[str]:
+        """Resolve a full ref name by reading the loose ref or packed-refs"""
+        git_dir = os.path.join(self.repo_path, ".git")
+        try:
+            with open(os.path.join(git_dir, ref)) as f:
+                return f.read().strip()
+        except OSError:
+            pass
+
+        try:
+            with open(os.path.join(git_dir, "packed-refs")) as f:
+                for line in f:
+                    if line.startswith(("#", "^")):
+                        continue
+                    sha, _, name = line.rstrip("\n").partition(" ")
+                    if name == ref:
+                        return sha
+        except OSError:
+            pass
+        return None
+
+    def _read_head(self) -> Tuple[str, str]:
+        """Get (current branch, HEAD sha) without spawning git where possible"""
+        branch = ""
+        sha = None
+        try:
+            with open(os.path.join(self.repo_path, ".git", "HEAD")) as f:
+                head = f.read().strip()
+            if head.startswith("ref: "):
+                ref = head[5:]
+                branch = ref[len("refs/heads/"):] if ref.startswith("refs/heads/") else ""
+                sha = self._resolve_ref(ref)
+            else:
+                sha = head
+        except OSError:
+            # Not a plain .git directory (worktree, submodule); ask git
+            branch = self._run_command(
+                ["git", "branch", "--show-current"], cwd=self.repo_path
+            ).strip()
+
+        if sha is None:
+            sha = self._run_command(["git", "rev-parse", "HEAD"], cwd=self.repo_path).strip()
+        return branch, sha
+
     def _run_command(self, cmd: List[str], cwd: Optional[str] = None) -> str:
         """Run a shell command and return output"""
-        result = subprocess.run(cmd, cwd=cwd, capture_output=True, text=True, check=True)
+        env = None
+        close_fds = True
+        if cmd[0] == "git":
+            # Let git change directory itself rather than chdir-ing the child
+            prefix = [self._git_path, "-C", cwd] if cwd else [self._git_path]
+            cmd = prefix + cmd[1:]
+            cwd = None
+            env = self._git_env
+            # With an absolute path, no cwd and close_fds off, CPython starts
+            # git with posix_spawn; Python's own fds are non-inheritable anyway
+            close_fds = False
+        result = subprocess.run(
+            cmd,
+            cwd=cwd,
+            env=env,
+            stdin=subprocess.DEVNULL,
+            capture_output=True,
+            text=True,
+            check=True,
+            close_fds=close_fds,
+        )
         return result.stdout
 
+    def _scan_backups(self) -> List[os.DirEntry]:
+        """Backup archives, newest first"""
+        if not os.path.exists(self.backup_dir):
+            return []
+        # DirEntry caches its stat, so each archive costs one syscall
+        with os.scandir(self.backup_dir) as it:
+            entries = [e for e in it if e.name.endswith(".tar.gz")]
+        entries.sort(key=lambda e: (e.stat().st_mtime, e.name), reverse=True)
+        return entries
+
     def _cleanup_old_backups(self):
         """Remove old backups beyond max_backups limit"""
         config = self.config_manager.get_ota_config()
         max_backups = config.get("max_backups", 5)
 
-        backups = self.list_backups().get("backups", [])
-        if len(backups) > max_backups:
-            for backup in backups[max_backups:]:
-                try:
-                    os.remove(os.path.join(self.backup_dir, f"{backup['name']}.tar.gz"))
-                except (OSError, IOError):
-                    pass
+        for entry in self._scan_backups()[max_backups:]:
+            try:
+                os.unlink(entry.path)
+            except (OSError, IOError):
+                pass
 
     def _log(self, message: str):
         """Log a message"""
         try:
-            os.makedirs(os.path.dirname(self.log_file), exist_ok=True)
-            with open(self.log_file, "a") as f:
-                f.write(f"{datetime.now().isoformat()} - {message}\n")
+            _ota_file_logger(self.log_file).info(message)
         except (OSError, IOError):
             pass
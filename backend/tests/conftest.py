@@ -35,6 +35,8 @@ def app_client(tmp_config, monkeypatch):
     monkeypatch.setattr(app_module, "config_manager", cm)
     monkeypatch.setattr(app_module, "ota_manager", om)
     monkeypatch.setattr(app_module, "theme_manager", tm)
+    monkeypatch.setattr(app_module, "_rendered_index", None)
+    monkeypatch.setattr(app_module, "_ap_manager_proc", None)
 
     app_module.app.config["TESTING"] = True
     with app_module.app.test_client() as client:
@@ -34,3 +34,11 @@ def mock_posthog_response(events=None, status_code=200):
     else:
         resp.json.return_value = {"results": []}
     return resp
+
+
+def mock_hogql_response(row=None, status_code=200):
+    """Build a mock requests.Response for a PostHog HogQL query."""
+    resp = MagicMock()
+    resp.status_code = status_code
+    resp.json.return_value = {"results": [row] if row is not None else []}
+    return resp
@@ -1,6 +1,7 @@
 """Route-level tests for non-PostHog endpoints."""
 
-from unittest.mock import patch
+import os
+from unittest.mock import MagicMock, patch
 
 import pytest
 
@@ -21,6 +22,39 @@ def test_health_returns_200_and_healthy(mock_subprocess, app_client):
     assert "timestamp" in data
 
 
+@patch("app.subprocess.Popen")
+@patch("app.subprocess.run")
+def test_wap_start_does_not_block(mock_run, mock_popen, monkeypatch):
+    """Losing the network spawns the AP manager in the background."""
+    import app as app_module
+
+    mock_run.return_value = type("R", (), {"returncode": 1})()
+    monkeypatch.setattr(app_module.os.path, "exists", lambda p: False)
+    monkeypatch.setattr(app_module, "_ap_manager_proc", None)
+
+    assert app_module.check_and_start_wap_if_needed() is True
+    mock_run.assert_called_once()  # only the ping
+    assert mock_popen.call_args[0][0] == ["sudo", app_module.AP_MANAGER_SCRIPT, "start"]
+
+
+@patch("app.subprocess.Popen")
+def test_ap_manager_runs_do_not_overlap(mock_popen, monkeypatch):
+    """A new AP manager run waits until the previous one has exited."""
+    import app as app_module
+
+    monkeypatch.setattr(app_module, "_ap_manager_proc", None)
+    mock_popen.return_value.poll.return_value = None  # still running
+
+    assert app_module.run_ap_manager("start") is True
+    assert app_module.run_ap_manager("start") is False
+    assert app_module.run_ap_manager("stop") is False
+    assert mock_popen.call_count == 1
+
+    mock_popen.return_value.poll.return_value = 0  # finished
+    assert app_module.run_ap_manager("stop") is True
+    assert mock_popen.call_args[0][0] == ["sudo", app_module.AP_MANAGER_SCRIPT, "stop"]
+
+
 def test_available_metrics_returns_all_7(app_client):
     """GET /api/metrics/available includes all 7 metric types."""
     response = app_client.get("/api/metrics/available")
@@ -107,6 +141,45 @@ def test_posthog_validation_rejects_missing_api_key(app_client, auth_headers):
     assert response.status_code == 400
 
 
+def test_posthog_validation_uses_head_request(app_client, auth_headers):
+    """Validation only needs the status code, so it sends a HEAD request."""
+    with patch("app._posthog_session") as mock_session:
+        mock_session.head.return_value = MagicMock(status_code=200)
+        response = app_client.post(
+            "/api/admin/config/validate/posthog",
+            json={"api_key": "phx_test", "project_id": "1", "host": "https://app.posthog.com"},
+            headers=auth_headers,
+        )
+    assert response.status_code == 200
+    assert response.get_json()["valid"] is True
+    mock_session.head.assert_called_once()
+    mock_session.get.assert_not_called()
+
+
+def test_posthog_validation_falls_back_to_get_on_405(app_client, auth_headers):
+    """Servers that reject HEAD are retried with GET."""
+    with patch("app._posthog_session") as mock_session:
+        mock_session.head.return_value = MagicMock(status_code=405)
+        mock_session.get.return_value = MagicMock(status_code=401)
+        response = app_client.post(
+            "/api/admin/config/validate/posthog",
+            json={"api_key": "phx_bad", "project_id": "1", "host": "https://app.posthog.com"},
+            headers=auth_headers,
+        )
+    assert response.status_code == 401
+    assert response.get_json()["error"] == "Invalid API key"
+
+
+def test_posthog_validation_does_not_retry_read_timeouts():
+    """Read timeouts aren't retried, so the short timeout bounds the call."""
+    import app as app_module
+
+    retries = app_module._posthog_session.get_adapter("https://app.posthog.com").max_retries
+    assert retries.read == 0
+    assert retries.connect == 1
+    assert retries.total == 1
+
+
 # ---------------------------------------------------------------------------
 # Network Connect — input validation
 # ---------------------------------------------------------------------------
@@ -134,6 +207,64 @@ def test_network_connect_rejects_short_password(app_client, auth_headers):
     assert "8-63 characters" in response.get_json()["error"]
 
 
+# ---------------------------------------------------------------------------
+# Network Status
+# ---------------------------------------------------------------------------
+
+
+def test_network_status_parses_concurrent_probes(app_client):
+    """All probe outputs are parsed into the status response."""
+    outputs = {
+        "ping": (0, ""),
+        "iwconfig": (0, 'wlan0  ESSID:"HomeNet"\n  Link Quality=60/70  Signal level=-50 dBm'),
+        "ip": (0, "    inet 192.168.1.20/24 brd 192.168.1.255 scope global wlan0"),
+    }
+
+    async def fake_probe(cmd, timeout):
+        return outputs.get(cmd[0])
+
+    with patch("app._probe", side_effect=fake_probe):
+        data = app_client.get("/api/network/status").get_json()
+
+    assert data["has_network"] is True
+    assert data["ip_addresses"] == ["192.168.1.20"]
+    assert data["wifi_status"]["ssid"] == "HomeNet"
+    assert data["wifi_status"]["signal"] == "60/70"
+
+
+def test_run_probes_tolerates_missing_commands():
+    """A probe whose binary is missing yields None instead of raising."""
+    import app as app_module
+
+    ok, missing = app_module.run_probes(
+        (["true"], 2), (["definitely-not-a-real-command"], 2)
+    )
+    assert ok == (0, "")
+    assert missing is None
+
+
+# ---------------------------------------------------------------------------
+# OTA jobs
+# ---------------------------------------------------------------------------
+
+
+def test_ota_update_async_returns_job(app_client, auth_headers):
+    """?async=1 answers with a job ID that the jobs endpoint resolves."""
+    import app as app_module
+
+    with patch.object(app_module.ota_manager, "perform_update", return_value={"success": True}):
+        response = app_client.post("/api/admin/ota/update?async=1", headers=auth_headers)
+        assert response.status_code == 202
+        job_id = response.get_json()["job_id"]
+        app_module.ota_manager._jobs[job_id].result(timeout=5)
+
+    job = app_client.get(f"/api/admin/ota/jobs/{job_id}", headers=auth_headers).get_json()
+    assert job == {"status": "done", "result": {"success": True}}
+
+    response = app_client.get("/api/admin/ota/jobs/unknown", headers=auth_headers)
+    assert response.status_code == 404
+
+
 # ---------------------------------------------------------------------------
 # Config Version
 # ---------------------------------------------------------------------------
@@ -147,3 +278,97 @@ def test_config_version_returns_hash_and_timestamp(app_client):
     assert "version" in data
     assert len(data["version"]) == 8  # first 8 chars of SHA256
     assert "timestamp" in data
+
+
+# ---------------------------------------------------------------------------
+# React app serving
+# ---------------------------------------------------------------------------
+
+
+def test_build_files_listing_is_cached(tmp_path, monkeypatch):
+    """Hashed build files are listed once and re-listed only when the dir changes."""
+    import app as app_module
+
+    js_dir = tmp_path / "js"
+    js_dir.mkdir()
+    (js_dir / "main.abc123.js").write_text("")
+    (js_dir / "main.abc123.js.map").write_text("")
+
+    assert app_module.list_build_files(str(js_dir), ".js") == ["main.abc123.js"]
+
+    listdir_calls = []
+    real_listdir = app_module.os.listdir
+    monkeypatch.setattr(
+        app_module.os, "listdir", lambda p: listdir_calls.append(p) or real_listdir(p)
+    )
+    assert app_module.list_build_files(str(js_dir), ".js") == ["main.abc123.js"]
+    assert listdir_calls == []
+
+    # A new build changes the directory mtime and invalidates the cache
+    (js_dir / "main.abc123.js").unlink()
+    (js_dir / "main.def456.js").write_text("")
+    os.utime(js_dir, ns=(0, 1))
+    assert app_module.list_build_files(str(js_dir), ".js") == ["main.def456.js"]
+
+
+def test_build_files_missing_dir_returns_empty(tmp_path):
+    """A missing build directory yields no files."""
+    import app as app_module
+
+    assert app_module.list_build_files(str(tmp_path / "nope"), ".css") == []
+
+
+def test_index_render_is_cached_until_config_changes(app_client, auth_headers):
+    """The index page is rendered once per config version."""
+    with patch("app.render_template", return_value="<html></html>") as mock_render:
+        assert app_client.get("/").status_code == 200
+        assert app_client.get("/config").status_code == 200
+        assert mock_render.call_count == 1
+
+        app_client.post(
+            "/api/admin/config",
+            json={"display": {"theme": "light"}},
+            headers=auth_headers,
+        )
+        app_client.get("/")
+        assert mock_render.call_count == 2
+
+
+def test_static_assets_are_cacheable(app_client, tmp_path, monkeypatch):
+    """Hashed assets are cached long-term; unhashed files revalidate."""
+    import app as app_module
+
+    (tmp_path / "static" / "js").mkdir(parents=True)
+    (tmp_path / "static" / "js" / "main.abc123.js").write_text("console.log(1)")
+    (tmp_path / "robots.txt").write_text("User-agent: *")
+    monkeypatch.setattr(app_module.app, "static_folder", str(tmp_path))
+
+    response = app_client.get("/static/js/main.abc123.js")
+    assert response.status_code == 200
+    assert "max-age=31536000" in response.headers["Cache-Control"]
+    response.close()
+
+    response = app_client.get("/robots.txt")
+    assert "max-age=3600" in response.headers["Cache-Control"]
+    etag = response.headers["ETag"]
+    response.close()
+
+    response = app_client.get("/robots.txt", headers={"If-None-Match": etag})
+    assert response.status_code == 304
+
+
+def test_layout_preview_missing_returns_404(app_client, tmp_path, monkeypatch):
+    """A missing preview image yields the plain 404 message."""
+    import app as app_module
+
+    (tmp_path / "layout-previews").mkdir()
+    (tmp_path / "layout-previews" / "classic.png").write_bytes(b"\x89PNG")
+    monkeypatch.setattr(app_module.app, "static_folder", str(tmp_path))
+
+    response = app_client.get("/layout-previews/classic.png")
+    assert response.status_code == 200
+    response.close()
+
+    response = app_client.get("/layout-previews/missing.png")
+    assert response.status_code == 404
+    assert response.get_data(as_text=True) == "Image not found"
@@ -37,8 +37,18 @@ def test_deep_merge_adds_new_default_keys(config_manager, tmp_config):
     assert "ota" in reloaded  # new default key added
 
 
+def test_deep_merge_leaves_inputs_untouched(config_manager):
+    """Merging nested updates never mutates the defaults it starts from."""
+    default = {"a": {"b": {"c": 1, "d": 2}}, "e": 3}
+    merged = config_manager._merge_configs(default, {"a": {"b": {"c": 9}}, "f": 4})
+
+    assert merged == {"a": {"b": {"c": 9, "d": 2}}, "e": 3, "f": 4}
+    assert default == {"a": {"b": {"c": 1, "d": 2}}, "e": 3}
+
+
 def test_write_failure_returns_false(config_manager, monkeypatch):
     """save_config returns False on PermissionError."""
+    config_manager.config["posthog"]["api_key"] = "unsaved"
     monkeypatch.setattr(
         "builtins.open",
         lambda *a, **kw: (_ for _ in ()).throw(PermissionError("read-only")),
@@ -46,6 +56,61 @@ def test_write_failure_returns_false(config_manager, monkeypatch):
     assert config_manager.save_config() is False
 
 
+@pytest.mark.parametrize("use_orjson", [True, False])
+def test_save_and_load_round_trip(tmp_config, monkeypatch, use_orjson):
+    """Config persists identically with and without the optional orjson."""
+    import config_manager as cm_module
+
+    if use_orjson and not cm_module.ORJSON_AVAILABLE:
+        pytest.skip("orjson not installed")
+    monkeypatch.setattr(cm_module, "ORJSON_AVAILABLE", use_orjson)
+
+    manager = cm_module.ConfigManager(config_file=tmp_config)
+    manager.update_config({"posthog": {"api_key": "round-trip"}})
+
+    with open(tmp_config) as f:
+        assert json.load(f)["posthog"]["api_key"] == "round-trip"
+    assert manager.load_config()["posthog"]["api_key"] == "round-trip"
+
+
+def test_save_is_atomic_and_skips_unchanged(config_manager, tmp_config, monkeypatch):
+    """Saves replace the file via a temp file and skip identical content."""
+    import config_manager as cm_module
+
+    replaced = []
+    real_replace = cm_module.os.replace
+    monkeypatch.setattr(
+        cm_module.os, "replace", lambda src, dst: replaced.append(src) or real_replace(src, dst)
+    )
+
+    assert config_manager.update_config({"posthog": {"api_key": "k1"}}) is True
+    assert replaced == [f"{tmp_config}.tmp"]
+    assert not os.path.exists(f"{tmp_config}.tmp")
+
+    # Same content again: nothing is written
+    assert config_manager.update_config({"posthog": {"api_key": "k1"}}) is True
+    assert len(replaced) == 1
+
+
+def test_concurrent_saves_leave_valid_json(config_manager, tmp_config):
+    """Saves from several threads never tear the shared temp file."""
+    import threading
+
+    def writer(n):
+        for i in range(20):
+            config_manager.save_config({"writer": n, "i": i, "pad": "x" * 4096 * n})
+
+    threads = [threading.Thread(target=writer, args=(n,)) for n in range(1, 5)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    with open(tmp_config) as f:
+        assert json.load(f)["i"] == 19
+    assert not os.path.exists(f"{tmp_config}.tmp")
+
+
 def test_get_config_returns_deep_copy(config_manager):
     """get_config returns a copy — mutating it doesn't affect internal state."""
     config = config_manager.get_config()
@@ -70,6 +135,49 @@ def test_hash_is_deterministic(config_manager):
     assert h1 == h2
 
 
+def test_hash_is_cached_until_save(config_manager, monkeypatch):
+    """The hash is computed once and recomputed only after a mutation."""
+    import config_manager as cm_module
+
+    calls = []
+    real_dumps = cm_module.json.dumps
+    monkeypatch.setattr(
+        cm_module.json, "dumps", lambda *a, **kw: calls.append(1) or real_dumps(*a, **kw)
+    )
+
+    h1 = config_manager.get_config_hash()
+    config_manager.get_config_hash()
+    assert len(calls) == 1
+
+    config_manager.update_ota_config({"branch": "dev"})
+    assert config_manager.get_config_hash() != h1
+    assert len(calls) == 2
+
+
+def test_hash_computed_during_save_is_not_cached(config_manager, monkeypatch):
+    """A hash of the old config that races a save does not stick."""
+    import config_manager as cm_module
+
+    real_dumps = cm_module.json.dumps
+    old_hash = config_manager.get_config_hash()
+    config_manager._config_hash = None
+    raced = []
+
+    def dumps_then_save(*args, **kwargs):
+        # Serialize the old config, then let a mutation and save land
+        # before the reader stores its result
+        result = real_dumps(*args, **kwargs)
+        if not raced:
+            raced.append(1)
+            config_manager.update_ota_config({"branch": "dev"})
+        return result
+
+    monkeypatch.setattr(cm_module.json, "dumps", dumps_then_save)
+
+    assert config_manager.get_config_hash() == old_hash
+    assert config_manager.get_config_hash() != old_hash
+
+
 def test_custom_theme_crud(config_manager):
     """Add, read, and delete a custom theme through ConfigManager."""
     theme_data = {"name": "Neon", "colors": {"background": "#000"}}
@@ -81,3 +189,15 @@ def test_custom_theme_crud(config_manager):
 
     assert config_manager.delete_custom_theme("neon") is True
     assert "neon" not in config_manager.get_custom_themes()
+
+
+def test_config_view_is_uncopied_and_read_only(config_manager):
+    """The view shares the live config and rejects direct writes."""
+    config_manager.update_config({"display": {"theme": "light"}})
+    view = config_manager.get_config_view()
+
+    assert view["display"] is config_manager.config["display"]
+    assert view["display"]["theme"] == "light"
+
+    with pytest.raises(TypeError):
+        view["display"] = {}
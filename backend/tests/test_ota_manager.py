@@ -1,6 +1,7 @@
 """Tests for OTAManager — all subprocess calls mocked."""
 
 import os
+import subprocess
 from unittest.mock import MagicMock, patch
 
 import pytest
@@ -14,6 +15,8 @@ def ota(config_manager, tmp_path):
     mgr = OTAManager(config_manager)
     mgr.repo_path = str(tmp_path)
     mgr.backup_dir = str(tmp_path / ".backups")
+    # No cron.d here, so schedule updates fall back to crontab unless a test creates it
+    mgr.cron_file = str(tmp_path / "cron.d" / "pi-analytics-ota")
     os.makedirs(mgr.backup_dir, exist_ok=True)
     return mgr
 
@@ -35,8 +38,9 @@ def test_switch_branch_rejects_leading_dot(ota):
     assert result.get("success") is False or "error" in result
 
 
+@patch.object(OTAManager, "_has_uncommitted_changes", return_value=False)
 @patch.object(OTAManager, "_run_command", return_value="")
-def test_switch_branch_accepts_valid_name(mock_cmd, ota):
+def test_switch_branch_accepts_valid_name(mock_cmd, mock_dirty, ota):
     """Valid branch names like 'feature/my-branch' are accepted."""
     result = ota.switch_branch("feature/my-branch")
     assert result.get("success") is True
@@ -61,6 +65,58 @@ def test_valid_cron_accepted(mock_cmd, ota):
     assert result.get("success") is True
 
 
+@patch.object(OTAManager, "_run_command", return_value="")
+def test_cron_schedule_written_to_cron_d(mock_cmd, ota, tmp_path):
+    """With a writable cron.d, the schedule is a drop-in file and crontab is untouched."""
+    (tmp_path / "cron.d").mkdir()
+
+    assert ota.update_cron_schedule("30 4 * * 1")["success"] is True
+
+    content = (tmp_path / "cron.d" / "pi-analytics-ota").read_text()
+    assert content.startswith("30 4 * * 1 ")
+    assert content.rstrip().endswith("scripts/boot-update.py")
+    assert os.listdir(tmp_path / "cron.d") == ["pi-analytics-ota"]
+    # Only checked for a stale entry; nothing to remove, so not rewritten
+    assert [c.args[0] for c in mock_cmd.call_args_list] == [["crontab", "-l"]]
+
+
+def test_cron_d_removes_old_crontab_entry(ota, tmp_path):
+    """Moving to the drop-in removes the OTA line from the user crontab."""
+    (tmp_path / "cron.d").mkdir()
+    installed = []
+
+    def fake_run(cmd, cwd=None):
+        if cmd == ["crontab", "-l"]:
+            return "0 1 * * * backup.sh\n0 3 * * * cd /x && python3 scripts/boot-update.py"
+        with open(cmd[1]) as f:
+            installed.append(f.read())
+        return ""
+
+    with patch.object(ota, "_run_command", side_effect=fake_run):
+        assert ota.update_cron_schedule("30 4 * * 1")["success"] is True
+
+    assert installed == ["0 1 * * * backup.sh"]
+
+
+@patch.object(OTAManager, "_run_command", return_value="")
+def test_cron_schedule_falls_back_to_crontab(mock_cmd, ota):
+    """Without cron.d access the user crontab is rewritten as before."""
+    assert ota.update_cron_schedule("0 3 * * *")["success"] is True
+    assert [c.args[0][0] for c in mock_cmd.call_args_list] == ["crontab", "crontab"]
+
+
+@patch.object(OTAManager, "_run_command", return_value="")
+def test_crontab_fallback_removes_stale_drop_in(mock_cmd, ota, tmp_path, monkeypatch):
+    """Falling back to crontab deletes an old drop-in so the job isn't scheduled twice."""
+    (tmp_path / "cron.d").mkdir()
+    stale = tmp_path / "cron.d" / "pi-analytics-ota"
+    stale.write_text("0 3 * * * root old\n")
+    monkeypatch.setattr(ota, "_write_cron_file", MagicMock(side_effect=PermissionError))
+
+    assert ota.update_cron_schedule("0 3 * * *")["success"] is True
+    assert not stale.exists()
+
+
 # ---------------------------------------------------------------------------
 # Rollback — path traversal
 # ---------------------------------------------------------------------------
@@ -123,3 +179,450 @@ def test_cleanup_respects_max_backups(ota, tmp_path):
 
     remaining = list(backup_dir.glob("*.tar.gz"))
     assert len(remaining) <= 2
+
+
+@patch.object(OTAManager, "_has_uncommitted_changes", return_value=False)
+@patch.object(OTAManager, "_run_command", return_value="")
+def test_operations_refused_while_another_runs(mock_cmd, mock_dirty, ota):
+    """A second repo-changing operation is rejected rather than interleaved."""
+    with ota._operation_lock:
+        result = ota.switch_branch("main")
+    assert result["success"] is False
+    assert "in progress" in result["error"]
+    mock_cmd.assert_not_called()
+
+    # Released again once the first operation finishes
+    assert ota.switch_branch("main")["success"] is True
+
+
+# ---------------------------------------------------------------------------
+# Reading refs without git
+# ---------------------------------------------------------------------------
+
+HEAD_SHA = "a" * 40
+REMOTE_SHA = "b" * 40
+
+
+@pytest.fixture
+def git_dir(ota, tmp_path):
+    """Minimal .git layout: HEAD on main, main packed, origin/main loose."""
+    git = tmp_path / ".git"
+    (git / "refs" / "remotes" / "origin").mkdir(parents=True)
+    (git / "HEAD").write_text("ref: refs/heads/main\n")
+    (git / "packed-refs").write_text(
+        "# pack-refs with: peeled fully-peeled sorted\n"
+        f"{HEAD_SHA} refs/heads/main\n"
+        f"{REMOTE_SHA} refs/tags/v1\n"
+        f"^{'c' * 40}\n"
+    )
+    (git / "refs" / "remotes" / "origin" / "main").write_text(f"{HEAD_SHA}\n")
+    return git
+
+
+def test_status_reads_head_from_files(ota, git_dir):
+    """Branch and commit come from .git/HEAD and packed-refs; only the dirty check runs git."""
+    with patch.object(ota, "_run_command") as mock_cmd:
+        with patch.object(ota, "_has_uncommitted_changes", return_value=False):
+            status = ota.get_status()
+
+    assert status["current_branch"] == "main"
+    assert status["current_commit"] == HEAD_SHA[:8]
+    mock_cmd.assert_not_called()
+
+
+def test_detached_head_has_no_branch(ota, git_dir):
+    """A detached HEAD holds the sha itself."""
+    (git_dir / "HEAD").write_text(f"{REMOTE_SHA}\n")
+    assert ota._read_head() == ("", REMOTE_SHA)
+
+
+def test_check_for_updates_up_to_date_skips_log(ota, git_dir):
+    """When HEAD matches the remote ref, no history is walked."""
+    with patch.object(ota, "_run_command", return_value="") as mock_cmd:
+        result = ota.check_for_updates()
+
+    assert result["update_available"] is False
+    assert result["behind_count"] == 0
+    assert not any("log" in c.args[0] for c in mock_cmd.call_args_list)
+
+
+def test_check_for_updates_counts_pending_commits(ota, git_dir):
+    """Pending commits are listed and counted from a single git log."""
+    (git_dir / "refs" / "remotes" / "origin" / "main").write_text(f"{REMOTE_SHA}\n")
+
+    def fake_run(cmd, cwd=None):
+        return "bbbbbbb Fix display\ncccccccc Add layout\n" if "log" in cmd else ""
+
+    with patch.object(ota, "_run_command", side_effect=fake_run):
+        result = ota.check_for_updates()
+
+    assert result["update_available"] is True
+    assert result["behind_count"] == 2
+    assert result["remote_commit"] == REMOTE_SHA[:8]
+
+
+def test_status_git_walk_cached_until_index_changes(ota, git_dir):
+    """`git status` runs once per index/HEAD state, not once per poll."""
+    index = git_dir / "index"
+    index.write_bytes(b"DIRC")
+
+    with patch.object(ota, "_has_uncommitted_changes", return_value=True) as mock_dirty:
+        assert ota.get_status()["has_uncommitted_changes"] is True
+        assert ota.get_status()["has_uncommitted_changes"] is True
+        assert mock_dirty.call_count == 1
+
+        os.utime(index, ns=(0, 1))
+        ota.get_status()
+        assert mock_dirty.call_count == 2
+
+
+def test_pending_commits_cached_per_sha_pair(ota, git_dir):
+    """Repeated checks against the same remote tip reuse the commit list."""
+    (git_dir / "refs" / "remotes" / "origin" / "main").write_text(f"{REMOTE_SHA}\n")
+
+    with patch.object(ota, "_run_command", return_value="bbbbbbb Fix display\n") as mock_cmd:
+        ota.check_for_updates()
+        ota.check_for_updates()
+
+    log_calls = [c for c in mock_cmd.call_args_list if "log" in c.args[0]]
+    assert len(log_calls) == 1
+
+
+def _fake_git(ls_remote_sha):
+    def run(cmd, cwd=None):
+        if "ls-remote" in cmd:
+            return f"{ls_remote_sha}\trefs/heads/main\n"
+        return ""
+
+    return run
+
+
+def test_check_for_updates_skips_fetch_when_remote_tip_unchanged(ota, git_dir):
+    """ls-remote matching origin/main means there is nothing new to fetch."""
+    with patch.object(ota, "_run_command", side_effect=_fake_git(HEAD_SHA)) as mock_cmd:
+        result = ota.check_for_updates()
+
+    assert result["update_available"] is False
+    assert not any("fetch" in c.args[0] for c in mock_cmd.call_args_list)
+
+
+def test_check_for_updates_fetches_when_remote_moved(ota, git_dir):
+    """A new remote tip triggers the fetch."""
+    with patch.object(ota, "_run_command", side_effect=_fake_git(REMOTE_SHA)) as mock_cmd:
+        ota.check_for_updates()
+
+    assert any("fetch" in c.args[0] for c in mock_cmd.call_args_list)
+
+
+def test_ls_remote_fast_path_can_be_disabled(ota, git_dir):
+    """skip_ls_remote_fast_path always fetches without probing the remote."""
+    ota.config_manager.update_ota_config({"skip_ls_remote_fast_path": True})
+    with patch.object(ota, "_run_command", side_effect=_fake_git(HEAD_SHA)) as mock_cmd:
+        ota.check_for_updates()
+
+    commands = [c.args[0] for c in mock_cmd.call_args_list]
+    assert any("fetch" in c for c in commands)
+    assert not any("ls-remote" in c for c in commands)
+
+
+def test_branch_listing_reuses_recent_fetch(ota, git_dir):
+    """Back-to-back branch operations fetch once, not once each."""
+    sentinel = git_dir.parent / ".backups" / ".last_fetch"
+    sentinel.write_text("")
+    os.utime(sentinel, (0, 0))
+
+    with patch.object(ota, "_run_command", return_value="") as mock_cmd, patch.object(
+        ota, "_has_uncommitted_changes", return_value=False
+    ):
+        ota.get_available_branches()
+        ota.get_available_branches()
+        ota.switch_branch("main")
+
+    fetches = [c for c in mock_cmd.call_args_list if "fetch" in c.args[0]]
+    assert len(fetches) == 1
+
+
+def test_perform_update_fetches_alongside_backup(ota, git_dir):
+    """The backup and fetch both run before the pull; force skips the status walk."""
+    with patch.object(ota, "_run_command", return_value="") as mock_cmd:
+        with patch.object(ota, "create_backup", return_value={"success": True}) as mock_backup:
+            result = ota.perform_update(force=True)
+
+    assert result["success"] is True
+    mock_backup.assert_called_once()
+    commands = [c.args[0] for c in mock_cmd.call_args_list]
+    assert not any("status" in c for c in commands)
+    fetch_index = next(i for i, c in enumerate(commands) if "fetch" in c)
+    pull_index = next(i for i, c in enumerate(commands) if "pull" in c)
+    assert fetch_index < pull_index
+
+
+@pytest.mark.parametrize("shallow", [True, False])
+def test_shallow_option_limits_fetch(ota, git_dir, shallow):
+    """With shallow enabled, the fetch asks for recent history without tags."""
+    ota.config_manager.update_ota_config({"shallow": shallow})
+    with patch.object(ota, "_run_command", return_value="") as mock_cmd:
+        with patch.object(ota, "create_backup", return_value={"success": True}):
+            ota.perform_update(force=True)
+
+    commands = [c.args[0] for c in mock_cmd.call_args_list]
+    fetch = next(c for c in commands if "fetch" in c)
+    pull = next(c for c in commands if "pull" in c)
+    assert ("--depth=20" in fetch) is shallow
+    assert ("--no-tags" in fetch) is shallow
+    # The pull must not cut history back to depth 20 after a deepen
+    assert "--depth=20" not in pull
+
+
+def test_shallow_update_unshallows_without_merge_base(ota, git_dir):
+    """A device too far behind for the shallow history gets the full history first."""
+    ota.config_manager.update_ota_config({"shallow": True})
+    (git_dir / "shallow").write_text(f"{REMOTE_SHA}\n")
+
+    def fake_run(cmd, cwd=None):
+        if "merge-base" in cmd:
+            raise subprocess.CalledProcessError(1, cmd)
+        return ""
+
+    with patch.object(ota, "_run_command", side_effect=fake_run) as mock_cmd:
+        with patch.object(ota, "create_backup", return_value={"success": True}):
+            assert ota.perform_update(force=True)["success"] is True
+
+    commands = [c.args[0] for c in mock_cmd.call_args_list]
+    unshallow = next(i for i, c in enumerate(commands) if "--unshallow" in c)
+    pull = next(i for i, c in enumerate(commands) if "pull" in c)
+    assert unshallow < pull
+
+
+def test_perform_update_stops_on_backup_failure(ota, git_dir):
+    """A failed backup aborts before anything in the working tree changes."""
+    with patch.object(ota, "_run_command", return_value="") as mock_cmd:
+        with patch.object(ota, "create_backup", return_value={"success": False, "error": "disk full"}):
+            result = ota.perform_update(force=True)
+
+    assert result["error"] == "Backup failed: disk full"
+    assert not any("pull" in c.args[0] for c in mock_cmd.call_args_list)
+
+
+# ---------------------------------------------------------------------------
+# Backups
+# ---------------------------------------------------------------------------
+
+
+def test_backup_excludes_heavy_directories(ota, tmp_path):
+    """Excluded directories are left out of the archive at any depth."""
+    import tarfile
+
+    (tmp_path / "backend" / "__pycache__").mkdir(parents=True)
+    (tmp_path / "backend" / "__pycache__" / "app.cpython-311.pyc").write_bytes(b"")
+    (tmp_path / "backend" / "app.py").write_text("")
+    (tmp_path / "frontend" / "node_modules" / "react").mkdir(parents=True)
+    (tmp_path / "frontend" / "package.json").write_text("{}")
+    (tmp_path / ".git").mkdir()
+
+    result = ota.create_backup("snap")
+    assert result["success"] is True
+    assert result["path"] == str(tmp_path / ".backups" / "snap.tar.gz")
+
+    with tarfile.open(result["path"]) as tar:
+        names = set(tar.getnames())
+    assert "./backend/app.py" in names
+    assert "./frontend/package.json" in names
+    assert not any(
+        part in {".git", "node_modules", "__pycache__", ".backups"}
+        for name in names
+        for part in name.split("/")
+    )
+    assert not (tmp_path / ".backups" / "snap.tar.gz.tmp").exists()
+
+
+def test_clean_cache_removes_each_pycache_once(ota, tmp_path):
+    """Every __pycache__ is removed once and reported as a count."""
+    for pkg in ("backend", "backend/tests", "scripts"):
+        (tmp_path / pkg / "__pycache__" / "nested").mkdir(parents=True)
+    (tmp_path / "backend" / "app.py").write_text("")
+
+    with patch.object(ota, "_run_command", return_value=""):
+        result = ota.clean_cache()
+
+    assert result["success"] is True
+    assert result["python_cache_dirs"] == 3
+    assert result["cleaned"].count("Python cache") == 1
+    assert not list(tmp_path.rglob("__pycache__"))
+    assert (tmp_path / "backend" / "app.py").exists()
+
+
+# ---------------------------------------------------------------------------
+# Update log
+# ---------------------------------------------------------------------------
+
+
+def test_update_log_appends_through_one_handler(ota, tmp_path):
+    """Messages share a single open handler and come back from get_logs."""
+    import logging
+
+    ota.log_file = str(tmp_path / "logs" / "ota.log")
+    ota._log("first")
+    ota._log("second")
+
+    handlers = logging.getLogger(f"ota.{ota.log_file}").handlers
+    assert len(handlers) == 1
+    handlers[0].flush()
+
+    logs = ota.get_logs()["logs"]
+    assert [line.rstrip("\n").split(" - ", 1)[1] for line in logs] == ["first", "second"]
+
+
+def test_update_log_unwritable_path_is_ignored(ota, tmp_path):
+    """An unwritable log location never breaks the caller."""
+    blocker = tmp_path / "not-a-dir"
+    blocker.write_text("")
+    ota.log_file = str(blocker / "ota.log")
+    ota._log("dropped")
+
+
+# ---------------------------------------------------------------------------
+# Running git
+# ---------------------------------------------------------------------------
+
+
+def test_git_runs_without_locks_or_prompts(config_manager, tmp_path):
+    """git gets the resolved binary, a lock-free env and no stdin."""
+    with patch("ota_manager.shutil.which", return_value="/usr/bin/git"):
+        ota = OTAManager(config_manager)
+    ota.repo_path = str(tmp_path)
+
+    with patch("ota_manager.subprocess.run") as mock_run:
+        mock_run.return_value = MagicMock(stdout="ok\n")
+        assert ota._run_command(["git", "status"], cwd=ota.repo_path) == "ok\n"
+
+    args, kwargs = mock_run.call_args
+    assert args[0] == ["/usr/bin/git", "-C", ota.repo_path, "status"]
+    assert kwargs["cwd"] is None
+    assert kwargs["env"]["GIT_OPTIONAL_LOCKS"] == "0"
+    assert kwargs["env"]["GIT_TERMINAL_PROMPT"] == "0"
+    assert kwargs["stdin"] is subprocess.DEVNULL
+    # Absolute path, no cwd and inherited fds keep git on the posix_spawn path
+    assert kwargs["close_fds"] is False
+
+
+def test_non_git_commands_keep_default_env(ota):
+    """Other commands inherit the environment untouched."""
+    with patch("ota_manager.subprocess.run") as mock_run:
+        mock_run.return_value = MagicMock(stdout="")
+        ota._run_command(["df", "-h", "/"])
+
+    args, kwargs = mock_run.call_args
+    assert args[0] == ["df", "-h", "/"]
+    assert kwargs["env"] is None
+
+
+def _status_popen(output):
+    proc = MagicMock()
+    proc.stdout.read.return_value = output
+    proc.poll.return_value = None
+    proc.wait.return_value = 0
+    return proc
+
+
+def test_dirty_check_stops_at_first_byte(ota):
+    """One byte of porcelain output is enough; git is stopped early."""
+    with patch("ota_manager.subprocess.Popen", return_value=_status_popen(b"1")) as mock_popen:
+        assert ota._has_uncommitted_changes() is True
+
+    proc = mock_popen.return_value
+    proc.stdout.read.assert_called_once_with(1)
+    proc.terminate.assert_called_once()
+    assert "--untracked-files=no" in mock_popen.call_args.args[0]
+
+
+def test_dirty_check_clean_tree(ota):
+    """No output means a clean tree."""
+    with patch("ota_manager.subprocess.Popen", return_value=_status_popen(b"")):
+        assert ota._has_uncommitted_changes() is False
+
+
+def test_dirty_check_raises_when_git_fails(ota):
+    """A failing git status is an error, not a clean tree."""
+    proc = _status_popen(b"")
+    proc.wait.return_value = 128
+    with patch("ota_manager.subprocess.Popen", return_value=proc):
+        with pytest.raises(subprocess.CalledProcessError):
+            ota._has_uncommitted_changes()
+
+
+def test_list_backups_newest_first(ota, tmp_path):
+    """Backups are listed newest first, whatever their names."""
+    backup_dir = tmp_path / ".backups"
+    for name, mtime in (("pre-release", 300), ("backup_20240101_120000", 100), ("manual", 200)):
+        path = backup_dir / f"{name}.tar.gz"
+        path.write_bytes(b"x" * mtime)
+        os.utime(path, (mtime, mtime))
+    (backup_dir / ".last_fetch").write_text("")
+
+    backups = ota.list_backups()["backups"]
+    assert [b["name"] for b in backups] == ["pre-release", "manual", "backup_20240101_120000"]
+    assert backups[0]["size"] == 300
+
+
+# ---------------------------------------------------------------------------
+# Background jobs
+# ---------------------------------------------------------------------------
+
+
+def test_perform_update_async_reports_result(ota):
+    """An async update returns a job ID whose result can be fetched later."""
+    with patch.object(ota, "perform_update", return_value={"success": True}) as mock_update:
+        job_id = ota.perform_update_async(force=True)["job_id"]
+        ota._jobs[job_id].result(timeout=5)
+
+    mock_update.assert_called_once_with(True)
+    assert ota.get_job(job_id) == {"status": "done", "result": {"success": True}}
+    # Finished jobs are dropped once read
+    assert ota.get_job(job_id) is None
+    assert ota.get_job("missing") is None
+
+
+def test_unread_jobs_are_capped(ota):
+    """Jobs nobody polls for are evicted oldest first."""
+    with patch.object(ota, "perform_update", return_value={"success": True}):
+        job_ids = [ota.perform_update_async()["job_id"] for _ in range(OTAManager.MAX_JOBS + 2)]
+
+    assert list(ota._jobs) == job_ids[2:]
+    assert ota.get_job(job_ids[0]) is None
+
+
+def test_cleanup_keeps_newest_backups(ota, tmp_path):
+    """Cleanup removes the oldest archives from a single directory scan."""
+    ota.config_manager.update_config({"ota": {"max_backups": 2}})
+    backup_dir = tmp_path / ".backups"
+    for i in range(4):
+        path = backup_dir / f"b{i}.tar.gz"
+        path.write_text("fake")
+        os.utime(path, (i, i))
+
+    with patch("ota_manager.os.scandir", wraps=os.scandir) as mock_scandir:
+        ota._cleanup_old_backups()
+
+    assert mock_scandir.call_count == 1
+    assert sorted(p.name for p in backup_dir.glob("*.tar.gz")) == ["b2.tar.gz", "b3.tar.gz"]
+
+
+# ---------------------------------------------------------------------------
+# Disk usage
+# ---------------------------------------------------------------------------
+
+
+def test_disk_usage_from_statvfs(ota):
+    """Disk usage comes from statvfs, formatted like `df -h`."""
+    gib = 1024 ** 3
+    fake = MagicMock(f_frsize=4096, f_blocks=29 * gib // 4096, f_bfree=25 * gib // 4096)
+    fake.f_bavail = fake.f_bfree - (gib // 4096)
+
+    with patch("ota_manager.os.statvfs", return_value=fake), patch.object(
+        ota, "_run_command"
+    ) as mock_cmd:
+        usage = ota.get_disk_usage()
+
+    mock_cmd.assert_not_called()
+    assert usage == {"total": "29G", "used": "4.0G", "available": "24G", "percent": "15%"}
@@ -10,7 +10,14 @@ from unittest.mock import MagicMock, patch
 import pytest
 import requests
 
-from helpers import make_posthog_event, mock_posthog_response
+from helpers import make_posthog_event, mock_hogql_response, mock_posthog_response
+
+
+@pytest.fixture(autouse=True)
+def hogql_unavailable():
+    """Default the HogQL aggregate query to unavailable (events-list fallback)."""
+    with patch("app.requests.post", return_value=mock_hogql_response(status_code=404)) as mock_post:
+        yield mock_post
 
 
 # ---------------------------------------------------------------------------
@@ -169,9 +176,10 @@ def test_500_returns_demo_metrics(mock_get, mock_subprocess, app_client, configu
     assert metrics["events_24h"] == 142  # DEMO_METRICS value
 
 
+@patch("app.subprocess.Popen")  # wifi-ap-manager.sh in check_and_start_wap_if_needed
 @patch("app.subprocess.run")
 @patch("app.requests.get")
-def test_connection_error_returns_network_error(mock_get, mock_subprocess, app_client, configured_posthog):
+def test_connection_error_returns_network_error(mock_get, mock_subprocess, mock_popen, app_client, configured_posthog):
     mock_get.side_effect = requests.exceptions.ConnectionError("No route to host")
 
     import app as app_module
@@ -181,9 +189,10 @@ def test_connection_error_returns_network_error(mock_get, mock_subprocess, app_c
     assert error == "NETWORK_ERROR"
 
 
+@patch("app.subprocess.Popen")  # wifi-ap-manager.sh in check_and_start_wap_if_needed
 @patch("app.subprocess.run")
 @patch("app.requests.get")
-def test_timeout_returns_network_error(mock_get, mock_subprocess, app_client, configured_posthog):
+def test_timeout_returns_network_error(mock_get, mock_subprocess, mock_popen, app_client, configured_posthog):
     mock_get.side_effect = requests.exceptions.Timeout("Read timed out")
 
     import app as app_module
@@ -210,6 +219,78 @@ def test_empty_24h_retries_7day(mock_get, mock_subprocess, app_client, configure
     assert mock_get.call_count == 2
 
 
+# ---------------------------------------------------------------------------
+# fetch_posthog_metrics — HogQL aggregate path
+# ---------------------------------------------------------------------------
+
+
+@patch("app.subprocess.run")
+@patch("app.requests.get")
+def test_hogql_aggregates_used_when_available(mock_get, mock_subprocess, hogql_unavailable, app_client, configured_posthog):
+    """Counts come from the HogQL query, not from the (capped) events list."""
+    hogql_unavailable.return_value = mock_hogql_response([1500, 300, 900, 450, 280, 60])
+    mock_get.return_value = mock_posthog_response(_events_fixture())
+
+    import app as app_module
+
+    metrics, error = app_module.fetch_posthog_metrics()
+    assert error is None
+    assert metrics["events_24h"] == 1500
+    assert metrics["unique_users_24h"] == 300
+    assert metrics["page_views_24h"] == 900
+    assert metrics["custom_events_24h"] == 450
+    assert metrics["sessions_24h"] == 280
+    assert metrics["events_1h"] == 60
+    assert metrics["avg_events_per_user"] == 5.0
+    # Activity feed still comes from the events list
+    assert len(metrics["recent_events"]) == len(_events_fixture())
+
+
+@patch("app.subprocess.run")
+@patch("app.requests.get")
+def test_hogql_network_error_falls_back_to_events(mock_get, mock_subprocess, hogql_unavailable, app_client, configured_posthog):
+    """A failing aggregate query falls back to client-side counting."""
+    hogql_unavailable.side_effect = requests.exceptions.Timeout("Read timed out")
+    mock_get.return_value = mock_posthog_response(_events_fixture())
+
+    import app as app_module
+
+    metrics, error = app_module.fetch_posthog_metrics()
+    assert error is None
+    assert metrics["events_24h"] == len(_events_fixture())
+    assert metrics["events_1h"] == 4
+
+
+@patch("app.subprocess.run")
+@patch("app.requests.get")
+def test_hogql_malformed_results_fall_back_to_events(mock_get, mock_subprocess, hogql_unavailable, app_client, configured_posthog):
+    """A results payload of the wrong shape falls back instead of erroring."""
+    hogql_unavailable.return_value.json.return_value = {"results": [None]}
+    mock_get.return_value = mock_posthog_response(_events_fixture())
+
+    import app as app_module
+
+    metrics, error = app_module.fetch_posthog_metrics()
+    assert error is None
+    assert metrics["events_24h"] == len(_events_fixture())
+
+
+@patch("app.subprocess.run")
+@patch("app.requests.get")
+def test_hogql_empty_24h_feed_uses_7day_events(mock_get, mock_subprocess, hogql_unavailable, app_client, configured_posthog):
+    """The activity feed still falls back to 7 days; counts stay from HogQL."""
+    hogql_unavailable.return_value = mock_hogql_response([0, 0, 0, 0, 0, 0])
+    events = _events_fixture()
+    mock_get.side_effect = [mock_posthog_response([]), mock_posthog_response(events)]
+
+    import app as app_module
+
+    metrics, error = app_module.fetch_posthog_metrics()
+    assert error is None
+    assert metrics["events_24h"] == 0
+    assert len(metrics["recent_events"]) == len(events)
+
+
 # ---------------------------------------------------------------------------
 # /api/stats/<layout> — route-level tests
 # ---------------------------------------------------------------------------
@@ -265,9 +346,10 @@ def test_nonexistent_layout_returns_404(app_client):
     assert response.status_code == 404
 
 
+@patch("app.subprocess.Popen")  # wifi-ap-manager.sh in check_and_start_wap_if_needed
 @patch("app.subprocess.run")
 @patch("app.requests.get")
-def test_network_error_returns_503_with_redirect(mock_get, mock_subprocess, app_client, configured_posthog):
+def test_network_error_returns_503_with_redirect(mock_get, mock_subprocess, mock_popen, app_client, configured_posthog):
     """Network error returns 503 with {error: 'network_lost', redirect: '/setup'}."""
     mock_get.side_effect = requests.exceptions.ConnectionError()
 
@@ -289,3 +371,56 @@ def test_recent_events_user_truncated(mock_get, mock_subprocess, app_client, con
 
     metrics, _ = app_module.fetch_posthog_metrics()
     assert len(metrics["recent_events"][0]["user"]) == 8
+
+
+# ---------------------------------------------------------------------------
+# Background metrics snapshot
+# ---------------------------------------------------------------------------
+
+
+@patch("app.requests.get")
+def test_stats_served_from_background_snapshot(mock_get, app_client, configured_posthog, monkeypatch):
+    """With the refresher running, /api/stats reads the snapshot, not PostHog."""
+    import threading
+
+    import app as app_module
+
+    ready = threading.Event()
+    ready.set()
+    monkeypatch.setattr(app_module, "_metrics_refresher_thread", object())
+    monkeypatch.setattr(app_module, "_metrics_snapshot_ready", ready)
+    fetched_at = "2024-01-01T12:00:00+00:00"
+    monkeypatch.setattr(
+        app_module,
+        "_metrics_snapshot",
+        {"metrics": dict(app_module.DEMO_METRICS), "error": None, "fetched_at": fetched_at},
+    )
+
+    response = app_client.get("/api/stats")
+    assert response.status_code == 200
+    assert response.get_json()["events_24h"] == 142
+    # Stamped with the fetch time, not the time the request was served
+    assert response.get_json()["last_updated"] == fetched_at
+    mock_get.assert_not_called()
+    # The shared snapshot is not mutated by the route
+    assert "last_updated" not in app_module._metrics_snapshot["metrics"]
+
+
+def test_posthog_config_change_requests_refresh(app_client, auth_headers, monkeypatch):
+    """Saving new credentials wakes the refresher instead of waiting out the interval."""
+    import threading
+
+    import app as app_module
+
+    requested = threading.Event()
+    monkeypatch.setattr(app_module, "_metrics_refresh_requested", requested)
+
+    app_client.post(
+        "/api/admin/config", json={"display": {"theme": "light"}}, headers=auth_headers
+    )
+    assert not requested.is_set()
+
+    app_client.post(
+        "/api/admin/config", json={"posthog": {"project_id": "999"}}, headers=auth_headers
+    )
+    assert requested.is_set()
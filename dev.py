@@ -4,6 +4,7 @@ Development server with file watching for DataOrb
 Automatically builds React and starts Flask dev server
 """
 import os
+import select
 import sys
 import subprocess
 import signal
@@ -14,6 +15,12 @@ from pathlib import Path
 # Store process references globally for cleanup
 processes = []
 
+# Signals write a byte here (signal.set_wakeup_fd), so main() can sleep in
+# select() until a child actually exits without the handler taking any locks
+wakeup_r, wakeup_w = os.pipe()
+os.set_blocking(wakeup_r, False)
+os.set_blocking(wakeup_w, False)
+
 def cleanup():
     """Clean up all child processes"""
     print("\n🛑 Cleaning up processes...")
@@ -56,13 +63,13 @@ def run_command(cmd, cwd=None, check=False, env=None):
             return result
         else:
             # Start new process group to ensure all child processes can be terminated
+            # Output goes straight to our terminal; an unread pipe would fill
+            # up and stall a chatty watcher
             process = subprocess.Popen(
                 cmd, 
                 cwd=cwd,
                 env=env,
-                preexec_fn=os.setsid,  # Create new process group
-                stdout=subprocess.PIPE,
-                stderr=subprocess.PIPE
+                start_new_session=True,  # Create new process group
             )
             return process
     except subprocess.CalledProcessError as e:
@@ -87,6 +94,9 @@ def main():
     atexit.register(cleanup)
     signal.signal(signal.SIGINT, signal_handler)
     signal.signal(signal.SIGTERM, signal_handler)
+    # SIGCHLD needs a Python handler for the wakeup fd to see it
+    signal.signal(signal.SIGCHLD, lambda signum, frame: None)
+    signal.set_wakeup_fd(wakeup_w)
     
     # Ensure we're in the right directory
     script_dir = Path(__file__).parent
@@ -194,15 +204,14 @@ def main():
             processes.append(flask_process)
             print("✅ Flask development server started (PID: {})".format(flask_process.pid))
             
-            # Check for early errors
-            time.sleep(2)
-            if flask_process.poll() is not None:
+            # Check for early errors (its output is already on the terminal)
+            try:
+                flask_process.wait(timeout=2)
                 print("❌ Flask server exited immediately")
-                stderr_output = flask_process.stderr.read().decode() if flask_process.stderr else ""
-                if stderr_output:
-                    print(f"   Error: {stderr_output[:500]}")
                 cleanup()
                 return
+            except subprocess.TimeoutExpired:
+                pass
         else:
             print("❌ Failed to start Flask server")
             cleanup()
@@ -215,21 +224,21 @@ def main():
         
         # Wait for processes
         while True:
+            # Drain before polling so an exit that races the check still wakes us
+            try:
+                os.read(wakeup_r, 512)
+            except BlockingIOError:
+                pass
             # Check if any process has terminated
             for i, process in enumerate(processes):
                 if process.poll() is not None:
                     process_name = "React" if i == 0 else "Flask"
                     print(f"\n❌ {process_name} process terminated unexpectedly")
-                    
-                    # Try to get error output
-                    if process.stderr:
-                        stderr_output = process.stderr.read().decode()
-                        if stderr_output:
-                            print(f"   Error output: {stderr_output[:500]}")
+                    print("   See its output above for details")
                     
                     cleanup()
                     return
-            time.sleep(1)
+            select.select([wakeup_r], [], [])
             
     except KeyboardInterrupt:
         # Signal handler will take care of cleanup
@@ -21,6 +21,9 @@ fi
 # Install required Python packages
 echo "Installing Python dependencies..."
 pip3 install smbus RPi.GPIO || true
+# libgpiod bindings, for waiting on the MCP23017 interrupt line (--int-pin),
+# and pydbus, for powering off through logind
+apt-get install -y python3-libgpiod python3-pydbus || true
 
 # Enable alternate I2C bus for HyperPixel
 echo "Configuring alternate I2C bus..."
@@ -106,6 +109,10 @@ echo "   - Button → MCP23017 GPA0 (pin 21) and GND"
 echo ""
 echo "3. Optional LED:"
 echo "   - LED + resistor → MCP23017 GPA1 (pin 22) and GND"
+echo "   - Or GPB0 (pin 1), then add --led-port-b to ExecStart"
+echo ""
+echo "4. Optional interrupt (avoids polling the I2C bus):"
+echo "   - MCP23017 INTA (pin 20) → a free Pi GPIO, then add --int-pin <gpio> to ExecStart"
 echo ""
 echo "Option 2: Using RUN Header Only"
 echo "-------------------------------"
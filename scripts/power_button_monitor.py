@@ -5,7 +5,9 @@ Monitors button press via I2C (MCP23017) and triggers safe shutdown
 Can also be used with direct GPIO if available
 """
 
+import ctypes
 import time
+import selectors
 import subprocess
 import sys
 import os
@@ -27,9 +29,26 @@ try:
 except ImportError:
     I2C_AVAILABLE = False
 
+# Try to import libgpiod (used to wait for edges instead of polling)
+try:
+    import gpiod
+    GPIOD_AVAILABLE = True
+except ImportError:
+    GPIOD_AVAILABLE = False
+
+# Try to import D-Bus bindings (used to ask logind to power off)
+try:
+    from pydbus import SystemBus
+    PYDBUS_AVAILABLE = True
+except ImportError:
+    PYDBUS_AVAILABLE = False
+
 # MCP23017 Registers
 IODIRA = 0x00  # I/O direction register A
 IODIRB = 0x01  # I/O direction register B
+GPINTENA = 0x04  # Interrupt-on-change enable register A
+INTCONA = 0x08   # Interrupt control register A
+IOCON = 0x0A     # Configuration register
 GPPUA = 0x0C   # Pull-up register A
 GPPUB = 0x0D   # Pull-up register B
 GPIOA = 0x12   # GPIO register A
@@ -41,8 +60,12 @@ OLATB = 0x15   # Output latch register B
 DEFAULT_I2C_BUS = 3  # Alternate I2C bus on HyperPixel
 DEFAULT_MCP_ADDRESS = 0x20
 DEFAULT_GPIO_PIN = 17  # If using direct GPIO instead of I2C
+DEFAULT_GPIO_CHIP = "gpiochip0"
 SHUTDOWN_HOLD_TIME = 3  # Seconds to hold for shutdown
-DEBOUNCE_TIME = 0.05  # Button debounce time
+DEBOUNCE_TIME = 0.02  # Interval between release samples
+RELEASE_SAMPLES = 2  # Consecutive released reads needed to end a press
+POLL_INTERVAL = 0.05  # Delay between reads when polling
+LINUX_REBOOT_CMD_POWER_OFF = 0x4321FEDC  # reboot(2) command for a direct power off
 
 # Setup logging
 logging.basicConfig(
@@ -56,7 +79,9 @@ class PowerButtonMonitor:
     """Monitor power button and handle shutdown"""
     
     def __init__(self, use_i2c: bool = True, i2c_bus: int = DEFAULT_I2C_BUS, 
-                 mcp_address: int = DEFAULT_MCP_ADDRESS, gpio_pin: int = DEFAULT_GPIO_PIN):
+                 mcp_address: int = DEFAULT_MCP_ADDRESS, gpio_pin: int = DEFAULT_GPIO_PIN,
+                 int_pin: Optional[int] = None, hold_time: float = SHUTDOWN_HOLD_TIME,
+                 led_port_b: bool = False):
         """
         Initialize power button monitor
         
@@ -65,20 +90,48 @@ class PowerButtonMonitor:
             i2c_bus: I2C bus number
             mcp_address: MCP23017 I2C address
             gpio_pin: GPIO pin number if not using I2C
+            int_pin: GPIO line wired to MCP23017 INTA; waits on it instead of polling
+            hold_time: Seconds to hold the button for shutdown
+            led_port_b: LED is on GPB0 instead of GPA1, away from the button's port
         """
         self.use_i2c = use_i2c and I2C_AVAILABLE
         self.running = True
-        self.button_pressed_time: Optional[float] = None
+        self.hold_time = hold_time
+        self._hold_ns = int(hold_time * 1e9)
+        # monotonic_ns() at the press, so clock steps (NTP at boot) can't skew it
+        self.button_pressed_time: Optional[int] = None
         self.last_state = False
+        self._release_count = 0
+        # The LED is the only output on its port, so its latch is written whole
+        self.led_port_b = led_port_b
+        self._led_latch = OLATB if led_port_b else OLATA
+        self._led_bit = 0x01 if led_port_b else 0x02
+        # Last LED state written; None until the first write
+        self._led_state: Optional[bool] = None
+        self.int_pin = int_pin if GPIOD_AVAILABLE else None
+        # Line whose edge events wake the monitor loop; None means polling
+        self.edge_line = None
+        self._selector = selectors.DefaultSelector()
+
+        if int_pin is not None and not GPIOD_AVAILABLE:
+            logger.warning("gpiod not installed - polling the button instead of using INTA")
         
         if self.use_i2c:
             try:
                 self.bus = smbus.SMBus(i2c_bus)
                 self.mcp_address = mcp_address
+                # Bound once; read_button() and set_led() run on every edge
+                self._read_reg = self.bus.read_byte_data
+                self._write_reg = self.bus.write_byte_data
                 self.setup_mcp23017()
-                logger.info(f"Initialized I2C button on bus {i2c_bus}, address 0x{mcp_address:02x}")
+                logger.info(
+                    "Initialized I2C button on bus %d, address 0x%02x", i2c_bus, mcp_address
+                )
+                if self.int_pin is not None:
+                    # INTA rises on a change; reading GPIOA drops it again
+                    self.watch_line(self.int_pin, gpiod.LINE_REQ_EV_RISING_EDGE)
             except Exception as e:
-                logger.error(f"Failed to initialize I2C: {e}")
+                logger.error("Failed to initialize I2C: %s", e)
                 if GPIO_AVAILABLE:
                     logger.info("Falling back to GPIO mode")
                     self.use_i2c = False
@@ -88,76 +141,176 @@ class PowerButtonMonitor:
         if not self.use_i2c and GPIO_AVAILABLE:
             self.gpio_pin = gpio_pin
             self.setup_gpio()
-            logger.info(f"Initialized GPIO button on pin {gpio_pin}")
+            logger.info("Initialized GPIO button on pin %d", gpio_pin)
         elif not self.use_i2c and not GPIO_AVAILABLE:
             logger.error("Neither I2C nor GPIO available!")
             sys.exit(1)
             
-        # Setup signal handlers
+        # The mode is fixed from here on, so pick the implementations once
+        if self.use_i2c:
+            self.read_button = self._read_button_i2c
+        else:
+            self.read_button = self._read_button_gpio
+            self.set_led = self._set_no_led
+
+        # Setup signal handlers. They only clear self.running; the wakeup fd
+        # makes a blocking wait return at once so the loop can notice.
+        self._wakeup_r, self._wakeup_w = os.pipe()
+        os.set_blocking(self._wakeup_w, False)
+        signal.set_wakeup_fd(self._wakeup_w)
+        self._selector.register(self._wakeup_r, selectors.EVENT_READ)
         signal.signal(signal.SIGINT, self.signal_handler)
         signal.signal(signal.SIGTERM, self.signal_handler)
         
     def signal_handler(self, signum, frame):
         """Handle shutdown signals"""
         logger.info("Received shutdown signal")
-        self.cleanup()
-        sys.exit(0)
+        # Cleanup runs in run() once the loop exits, not from inside the handler
+        self.running = False
         
     def setup_mcp23017(self):
         """Configure MCP23017 for button input with LED output"""
+        interrupts = self.int_pin is not None
+        iocon = 0x02 if interrupts else 0x00
+        led_a = 0x00 if self.led_port_b else self._led_bit
+        led_b = self._led_bit if self.led_port_b else 0x00
+        # Bank 0 register file, IODIRA through OLATB. Writes to the INTF/INTCAP
+        # slots are ignored and GPIO writes land in the output latches.
+        registers = [
+            0x01, 0xFE if self.led_port_b else 0xFF,  # IODIRA/B: GPA0 input (button)
+            0x00, 0x00,  # IPOLA/B
+            0x01 if interrupts else 0x00, 0x00,  # GPINTENA/B: GPA0 change
+            0x00, 0x00,  # DEFVALA/B
+            0x00, 0x00,  # INTCONA/B: compare with previous value
+            iocon, iocon,  # IOCON (mirrored): INTA push-pull, active high
+            0x01, 0x00,  # GPPUA/B: pull-up on GPA0
+            0x00, 0x00,  # INTFA/B
+            0x00, 0x00,  # INTCAPA/B
+            led_a, led_b,  # GPIOA/B: LED on to indicate ready
+            led_a, led_b,  # OLATA/B
+        ]
+        try:
+            # Sequential addressing (IOCON.SEQOP=0) programs the chip in one write
+            self.bus.write_i2c_block_data(self.mcp_address, IODIRA, registers)
+            self._led_state = True
+            return
+        except Exception as e:
+            logger.debug("Block write failed, configuring registers one by one: %s", e)
+
         # Set GPA0 as input (button), GPA1 as output (LED)
-        self.bus.write_byte_data(self.mcp_address, IODIRA, 0x01)
+        self._write_reg(self.mcp_address, IODIRA, 0x01)
+        if self.led_port_b:
+            # GPB0 as output (LED); the rest of port B stays input
+            self._write_reg(self.mcp_address, IODIRB, 0xFE)
         # Enable pull-up on GPA0 (button)
-        self.bus.write_byte_data(self.mcp_address, GPPUA, 0x01)
+        self._write_reg(self.mcp_address, GPPUA, 0x01)
+        if interrupts:
+            # INTA push-pull, active high
+            self._write_reg(self.mcp_address, IOCON, iocon)
+            # Interrupt on any GPA0 change (press and release), not against DEFVAL
+            self._write_reg(self.mcp_address, INTCONA, 0x00)
+            self._write_reg(self.mcp_address, GPINTENA, 0x01)
         # Turn on LED to indicate ready
         self.set_led(True)
         
+    def watch_line(self, pin: int, event_type: int):
+        """
+        Request edge events on a Pi GPIO line and wait on its fd
+
+        Args:
+            pin: GPIO line offset on the default chip
+            event_type: gpiod edge request type
+        """
+        try:
+            line = gpiod.Chip(DEFAULT_GPIO_CHIP).get_line(pin)
+            line.request(consumer="dataorb-power-button", type=event_type)
+            self._selector.register(line.event_get_fd(), selectors.EVENT_READ)
+            self.edge_line = line
+            logger.info("Waiting for edges on GPIO %d", pin)
+        except Exception as e:
+            logger.warning("Could not watch GPIO %d for edges, polling instead: %s", pin, e)
+            self.edge_line = None
+
+    def wait_for_change(self, timeout: Optional[float]) -> bool:
+        """
+        Sleep until the button may have changed
+
+        Args:
+            timeout: Longest time to wait when watching a line for edges;
+                None waits until an edge or a signal arrives
+
+        Returns:
+            True if an edge fired, or always when polling
+        """
+        if self.edge_line is None:
+            timeout = POLL_INTERVAL
+
+        changed = self.edge_line is None
+        for key, _ in self._selector.select(timeout):
+            if key.fd == self._wakeup_r:
+                # A signal arrived; its handler has already run
+                os.read(self._wakeup_r, 512)
+            else:
+                # Drain queued edges; the state itself is re-read by the caller
+                self.edge_line.event_read_multiple()
+                changed = True
+        return changed
+
     def setup_gpio(self):
         """Configure direct GPIO for button input"""
         GPIO.setmode(GPIO.BCM)
         GPIO.setup(self.gpio_pin, GPIO.IN, pull_up_down=GPIO.PUD_UP)
+        if GPIOD_AVAILABLE:
+            # Press and release both matter for the hold timer
+            self.watch_line(self.gpio_pin, gpiod.LINE_REQ_EV_BOTH_EDGES)
         
-    def read_button(self) -> bool:
+    def _read_button_i2c(self) -> bool:
         """
-        Read button state
+        Read button state from the MCP23017 (installed as read_button)
         
         Returns:
             True if button is pressed, False otherwise
         """
         try:
-            if self.use_i2c:
-                # Read GPIOA register from MCP23017
-                state = self.bus.read_byte_data(self.mcp_address, GPIOA)
-                # Button pressed when GPA0 is LOW (active low with pull-up)
-                return (state & 0x01) == 0
-            else:
-                # Read GPIO pin (active low with pull-up)
-                return GPIO.input(self.gpio_pin) == 0
+            # Button pressed when GPA0 is LOW (active low with pull-up)
+            return (self._read_reg(self.mcp_address, GPIOA) & 0x01) == 0
+        except Exception as e:
+            logger.error("Error reading button: %s", e)
+            return False
+
+    def _read_button_gpio(self) -> bool:
+        """
+        Read button state from the GPIO pin (installed as read_button)
+
+        Returns:
+            True if button is pressed, False otherwise
+        """
+        try:
+            # Read GPIO pin (active low with pull-up)
+            return GPIO.input(self.gpio_pin) == 0
         except Exception as e:
-            logger.error(f"Error reading button: {e}")
+            logger.error("Error reading button: %s", e)
             return False
             
     def set_led(self, state: bool):
         """
-        Control status LED (if using MCP23017)
+        Control status LED on the MCP23017
         
         Args:
             state: True for on, False for off
         """
-        if not self.use_i2c:
+        if state == self._led_state:
             return
-            
+
         try:
-            current = self.bus.read_byte_data(self.mcp_address, GPIOA)
-            if state:
-                # Set GPA1 high (LED on)
-                self.bus.write_byte_data(self.mcp_address, GPIOA, current | 0x02)
-            else:
-                # Set GPA1 low (LED off)
-                self.bus.write_byte_data(self.mcp_address, GPIOA, current & ~0x02)
+            self._write_reg(self.mcp_address, self._led_latch, self._led_bit if state else 0x00)
+            self._led_state = state
         except Exception as e:
-            logger.error(f"Error setting LED: {e}")
+            logger.error("Error setting LED: %s", e)
             
+    def _set_no_led(self, state: bool):
+        """Stand-in for set_led in GPIO mode, which has no status LED"""
+
     def blink_led(self, times: int = 3, interval: float = 0.2):
         """
         Blink LED to indicate action
@@ -180,7 +333,7 @@ class PowerButtonMonitor:
                 f.write(str(time.time()))
             logger.info("Saved shutdown state")
         except Exception as e:
-            logger.error(f"Error saving state: {e}")
+            logger.error("Error saving state: %s", e)
             
     def shutdown(self):
         """Perform safe shutdown"""
@@ -193,79 +346,126 @@ class PowerButtonMonitor:
         # Save application state
         self.save_state()
         
-        # Stop DataOrb service if running
+        # No need to stop dataorb-display here: systemd stops it during
+        # shutdown, before this unit (which is ordered Before= it)
+        if PYDBUS_AVAILABLE:
+            try:
+                logger.info("Requesting power off from logind...")
+                SystemBus().get("org.freedesktop.login1").PowerOff(False)
+                return
+            except Exception as e:
+                logger.warning("logind power off failed: %s", e)
+
+        # Perform system shutdown; the service runs as root, so sudo is
+        # only needed when started by hand
+        is_root = os.geteuid() == 0
+        sudo = [] if is_root else ['sudo']
         try:
-            subprocess.run(['sudo', 'systemctl', 'stop', 'dataorb-display'], 
-                         check=False, timeout=5)
-            logger.info("Stopped DataOrb display service")
+            logger.info("Executing system shutdown...")
+            subprocess.run(sudo + ['shutdown', '-h', 'now'], check=True)
+            return
         except Exception as e:
-            logger.warning(f"Could not stop display service: {e}")
-            
-        # Perform system shutdown
+            logger.error("Shutdown command failed: %s", e)
+
+        # Try alternative shutdown method. As root that is the reboot(2)
+        # syscall itself, so flush the saved state first: init won't.
         try:
-            logger.info("Executing system shutdown...")
-            subprocess.run(['sudo', 'shutdown', '-h', 'now'])
+            if is_root:
+                os.sync()
+                libc = ctypes.CDLL("libc.so.6", use_errno=True)
+                libc.reboot(LINUX_REBOOT_CMD_POWER_OFF)
+                # Only returns on failure
+                raise OSError(ctypes.get_errno(), "reboot(2) failed")
+            subprocess.run(sudo + ['halt'], check=True)
         except Exception as e:
-            logger.error(f"Shutdown command failed: {e}")
-            # Try alternative shutdown method
-            try:
-                subprocess.run(['sudo', 'halt'])
-            except:
-                logger.critical("All shutdown methods failed!")
+            logger.critical("All shutdown methods failed! %s", e)
                 
     def monitor_button(self):
         """Main monitoring loop"""
         logger.info("Power button monitor started")
-        logger.info(f"Hold button for {SHUTDOWN_HOLD_TIME} seconds to shutdown")
+        logger.info("Hold button for %s seconds to shutdown", self.hold_time)
         
+        monotonic_ns = time.monotonic_ns
+
         while self.running:
             try:
-                button_pressed = self.read_button()
-                
-                # Debounce
-                if button_pressed != self.last_state:
-                    time.sleep(DEBOUNCE_TIME)
-                    button_pressed = self.read_button()
+                now = monotonic_ns()
+
+                # Debounce the trailing edge only: a press counts at once, a
+                # release only after RELEASE_SAMPLES released reads in a row
+                if self.read_button():
+                    self._release_count = 0
+                    button_pressed = True
+                elif self.last_state:
+                    self._release_count += 1
+                    button_pressed = self._release_count < RELEASE_SAMPLES
+                else:
+                    button_pressed = False
                     
                 if button_pressed and not self.last_state:
                     # Button just pressed
-                    self.button_pressed_time = time.time()
+                    self.button_pressed_time = now
                     logger.info("Power button pressed...")
-                    if self.use_i2c:
-                        self.set_led(False)  # Turn off LED during press
+                    self.set_led(False)  # Turn off LED during press
                         
-                elif button_pressed and self.button_pressed_time:
+                elif button_pressed and self.button_pressed_time is not None:
                     # Button held
-                    hold_time = time.time() - self.button_pressed_time
-                    if hold_time >= SHUTDOWN_HOLD_TIME:
-                        logger.info(f"Button held for {hold_time:.1f}s - shutting down...")
+                    held_ns = now - self.button_pressed_time
+                    if held_ns >= self._hold_ns:
+                        logger.info("Button held for %.1fs - shutting down...", held_ns / 1e9)
                         self.shutdown()
                         self.running = False
                         
                 elif not button_pressed and self.last_state:
                     # Button released
-                    if self.button_pressed_time:
-                        hold_time = time.time() - self.button_pressed_time
-                        if hold_time < SHUTDOWN_HOLD_TIME:
-                            logger.info(f"Button released after {hold_time:.1f}s - ignored")
+                    self._release_count = 0
+                    if self.button_pressed_time is not None:
+                        held_ns = now - self.button_pressed_time
+                        if held_ns < self._hold_ns:
+                            logger.info("Button released after %.1fs - ignored", held_ns / 1e9)
                         self.button_pressed_time = None
-                        if self.use_i2c:
-                            self.set_led(True)  # Turn LED back on
+                        self.set_led(True)  # Turn LED back on
                             
                 self.last_state = button_pressed
-                time.sleep(0.05)  # Small delay to reduce CPU usage
+
+                if button_pressed and self.button_pressed_time is not None:
+                    # Wake up in time to catch the hold threshold, or sooner
+                    # to confirm a pending release
+                    timeout = (self.button_pressed_time + self._hold_ns - now) / 1e9
+                    if self._release_count:
+                        timeout = min(timeout, DEBOUNCE_TIME)
+                    self.wait_for_change(max(0.0, timeout))
+                elif self.edge_line is not None:
+                    # Nothing pending, so block until an edge; a signal wakeup
+                    # only needs self.running checked, not another I2C read
+                    while self.running and not self.wait_for_change(None):
+                        pass
+                else:
+                    self.wait_for_change(None)
                 
             except KeyboardInterrupt:
                 logger.info("Keyboard interrupt received")
                 break
             except Exception as e:
-                logger.error(f"Error in monitor loop: {e}")
+                logger.error("Error in monitor loop: %s", e)
                 time.sleep(1)  # Wait before retrying
                 
     def cleanup(self):
         """Clean up resources"""
         logger.info("Cleaning up...")
         
+        if self.edge_line is not None:
+            try:
+                self.edge_line.release()
+            except:
+                pass
+            self.edge_line = None
+
+        signal.set_wakeup_fd(-1)
+        self._selector.close()
+        os.close(self._wakeup_r)
+        os.close(self._wakeup_w)
+
         if self.use_i2c:
             try:
                 self.set_led(False)  # Turn off LED
@@ -285,7 +485,7 @@ class PowerButtonMonitor:
         try:
             self.monitor_button()
         except Exception as e:
-            logger.error(f"Fatal error: {e}")
+            logger.error("Fatal error: %s", e)
         finally:
             self.cleanup()
 
@@ -305,6 +505,11 @@ def main():
     parser.add_argument('--mcp-address', type=lambda x: int(x, 0), 
                        default=DEFAULT_MCP_ADDRESS,
                        help=f'MCP23017 I2C address (default: 0x{DEFAULT_MCP_ADDRESS:02x})')
+    parser.add_argument('--int-pin', type=int, default=None,
+                       help='GPIO line wired to MCP23017 INTA; '
+                            'waits for interrupts instead of polling')
+    parser.add_argument('--led-port-b', action='store_true',
+                       help='Status LED is wired to GPB0 instead of GPA1')
     parser.add_argument('--hold-time', type=float, default=SHUTDOWN_HOLD_TIME,
                        help=f'Hold time for shutdown in seconds (default: {SHUTDOWN_HOLD_TIME})')
     parser.add_argument('--debug', action='store_true',
@@ -316,21 +521,20 @@ def main():
     if args.debug:
         logging.getLogger().setLevel(logging.DEBUG)
         
-    # Update global config
-    global SHUTDOWN_HOLD_TIME
-    SHUTDOWN_HOLD_TIME = args.hold_time
-    
     # Create and run monitor
     try:
         monitor = PowerButtonMonitor(
             use_i2c=not args.gpio,
             i2c_bus=args.i2c_bus,
             mcp_address=args.mcp_address,
-            gpio_pin=args.gpio_pin
+            gpio_pin=args.gpio_pin,
+            int_pin=args.int_pin,
+            hold_time=args.hold_time,
+            led_port_b=args.led_port_b
         )
         monitor.run()
     except Exception as e:
-        logger.error(f"Failed to start monitor: {e}")
+        logger.error("Failed to start monitor: %s", e)
         sys.exit(1)
 
 